@@ -50,7 +50,7 @@ class Apartments(tk.Frame):
         self.details_frame.pack_forget()  # Hide the details frame from the user
 
         apartment_id = tree.item(item_id, 'values')[0]
-        self.edit_frame.apartment.populate_fields(apartment_id, item_id)  # Inserting record into the fields
+        self.edit_frame.apartment.populate_fields(apartment_id)  # Inserting record into the fields
         self.edit_frame.show_details_frame()
         self.edit_frame.pack(fill='both', expand=True)
         self.edit_frame.set_focus()
@@ -82,8 +82,10 @@ class Apartments(tk.Frame):
             f"{'Postcode:':20}\t{record[5]}")
 
         if messagebox.askyesno(title='Confirm Deletion', message=msg):
-            tree.delete(item_id)
             SQL.apartments.delete_apartment(record[0])
+            # A listing may have refilled the tree whilst the dialog was open, replacing the selected row
+            if tree.exists(item_id):
+                tree.delete(item_id)
             self.show_details_frame()
 
             messagebox.showinfo(title="Successful Deletion",
@@ -108,6 +110,9 @@ class ApartmentDetails(tk.Frame):
         self.search_field = "ApartmentID"
         self.previous_sort_fields = ['', '']
         self.search_term = ''  # This is used to prevent constant queries to the database when spam clicking 'search'
+        # 'listing' is the arguments of the listing being shown, so the records of a listing that has since been
+        # replaced (for example by sorting again) are thrown away
+        self.listing = None
         header_names = ("ApartmentID", "Num Flats", "Num Tenants", "Upkeep", "Address", "Postcode")
 
         # Creating the widgets
@@ -204,13 +209,13 @@ class ApartmentDetails(tk.Frame):
 
         self.previous_sort_fields = ['', '']
         self.tree.delete(*self.tree.get_children())
-        self.sort_records()
-
-        messagebox.showinfo(title='Refreshed', message="Successfully refreshed records!")
+        self.sort_records(done=lambda: messagebox.showinfo(title='Refreshed',
+                                                           message="Successfully refreshed records!"))
 
-    def sort_records(self, sort_field="ApartmentID"):
-        records = SQL.apartments.get_apartments(self.field_names.get(sort_field, f"Apartment{sort_field}"),
-                                                self.search_field, self.search_term)
+    def sort_records(self, sort_field="ApartmentID", done=None):
+        # The records are fetched on the database thread so the window doesn't freeze on large tables
+        records = SQL.nonblocking.apartments.get_apartments(self.field_names.get(sort_field, f"Apartment{sort_field}"),
+                                                            self.search_field, self.search_term)
 
         previous_sort_field = self.previous_sort_fields[1]
         if previous_sort_field:
@@ -226,11 +231,30 @@ class ApartmentDetails(tk.Frame):
             self.previous_sort_fields[0] = sort_field
             self.tree.heading(sort_field, text=sort_field + " ▲")
 
+        listing = self.listing = (sort_field, self.search_field, self.search_term, insert_index)
+        SQL.executor.when_done(self, records,
+                               lambda apartments: self.insert_records(listing, apartments, insert_index, done))
+
+    def insert_records(self, listing, records, insert_index, done=None):
+        if listing is not self.listing:
+            return
+
         self.tree.delete(*self.tree.get_children())
         for apartment in records:
             apartment = [f"{val}" if type(val) != float else f"£{val:.2f}" for val in apartment]
             self.tree.insert("", index=insert_index, values=apartment)
 
+        if done is not None:
+            done()
+
+    # This function updates the row of the given apartment, if it is being shown.
+    # The row is looked up by apartment ID, as a listing may have replaced the rows since it was selected.
+    def update_row(self, apartment_id, values):
+        for item_id in self.tree.get_children():
+            if self.tree.set(item_id, "ApartmentID") == apartment_id:
+                self.tree.item(item_id, values=values)
+                return
+
     def menu_popup(self, event):
         item_id = self.tree.identify_row(event.y)
         if item_id:
@@ -360,8 +384,6 @@ class EditApartment(tk.Frame):
         self.master = master
         self.controller = controller
 
-        self.item_id = ''
-
         # This function allows you to pack the label and entry side by side.
         # It returns the entry object for later usage.
         def make_labelled_entry(parent, label_text):
@@ -435,8 +457,7 @@ class EditApartment(tk.Frame):
         self.postcode.delete(0, 'end')
         self.description.delete('1.0', tk.END)
 
-    def populate_fields(self, apartment_id, item_id):
-        self.item_id = item_id
+    def populate_fields(self, apartment_id):
         self.update_fields(apartment_id)
 
     def update_fields(self, apartment_id):
@@ -444,22 +465,25 @@ class EditApartment(tk.Frame):
         self.apartment_id.insert(0, apartment_id)
         self.apartment_id.config(state='readonly')
 
-        record = list(SQL.apartments.get_apartment(apartment_id)[0])
-        record[2] = f"£{record[2]:.2f}"
-        self.controller.details_frame.tree.item(self.item_id, values=(apartment_id, *record[:-1]))
+        record = SQL.apartments.get_apartment(apartment_id)[0]
+        upkeep = f"£{record.Upkeep:.2f}"
+        self.controller.details_frame.update_row(apartment_id, (apartment_id, record.NumFlats,
+                                                                record.NumTenants, upkeep,
+                                                                record.ApartmentAddress,
+                                                                record.ApartmentPostcode))
 
-        self.num_flats.insert(0, record[0])
+        self.num_flats.insert(0, record.NumFlats)
         self.num_flats.config(state='readonly')
 
-        self.num_tenants.insert(0, record[1])
+        self.num_tenants.insert(0, record.NumTenants)
         self.num_tenants.config(state='readonly')
 
-        self.upkeep.insert(0, record[2])
+        self.upkeep.insert(0, upkeep)
         self.upkeep.config(state='readonly')
 
-        self.address.insert(0, record[3])
-        self.postcode.insert(0, record[4])
-        self.description.insert('1.0', record[5])
+        self.address.insert(0, record.ApartmentAddress)
+        self.postcode.insert(0, record.ApartmentPostcode)
+        self.description.insert('1.0', record.ApartmentDescription)
 
     def edit_apartment(self, _event=None):
         self.response['foreground'] = 'red'
@@ -486,7 +510,7 @@ class EditApartment(tk.Frame):
 
         record = (apartment_id, self.num_flats.get(), self.num_tenants.get(),
                   self.upkeep.get(), address, postcode)
-        self.controller.details_frame.tree.item(self.item_id, values=record)
+        self.controller.details_frame.update_row(apartment_id, record)
 
         # Clear entry fields after account creation
         self.clear_fields()
@@ -201,7 +201,7 @@ class EmployeeDetails(tk.Frame):
 
     def sort_records(self, sort_field="EmployeeID"):
         records = SQL.employees.get_employees(self.field_names.get(sort_field, f"Employee{sort_field}"),
-                                              self.search_field, self.search_term)
+                                              self.search_field, self.search_term, stream=True)
 
         previous_sort_field = self.previous_sort_fields[1]
         if previous_sort_field:
@@ -453,12 +453,12 @@ class EditEmployee(tk.Frame):
         self.employee_id.config(state='readonly')
 
         record = SQL.employees.get_employee(employee_id)[0]
-        self.forename.insert(0, record[0])
-        self.surname.insert(0, record[1])
-        self.contact.insert(0, record[2])
-        self.address.insert(0, record[3])
-        self.postcode.insert(0, record[4])
-        self.description.insert('1.0', record[5])
+        self.forename.insert(0, record.EmployeeForename)
+        self.surname.insert(0, record.EmployeeSurname)
+        self.contact.insert(0, record.EmployeeContact)
+        self.address.insert(0, record.EmployeeAddress)
+        self.postcode.insert(0, record.EmployeePostcode)
+        self.description.insert('1.0', record.EmployeeDescription)
 
     def edit_employee(self, _event=None):
         self.response['foreground'] = 'red'
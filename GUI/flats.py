@@ -127,9 +127,6 @@ class FlatDetails(tk.Frame):
         self.sort_records(sort_field)
 
     def sort_records(self, sort_field="Flat Number"):
-        if sort_field == "Tenants":
-            return
-
         records = SQL.flats.get_flats(self.master.apartment.apartment_id.get(),
                                       self.field_names.get(sort_field, f"Flat{sort_field}"),
                                       self.search_field, self.search_term)
@@ -277,8 +274,14 @@ class RegisterFlat(tk.Frame):
 
         description = self.description.get('1.0', tk.END)
 
-        record = (SQL.flats.get_free_flat_id(), apartment_id, flat_number, weekly_rent, description)
-        SQL.flats.add_flat(record)
+        # The ID is given back if the flat can't be added (for example if the apartment was deleted meanwhile),
+        # rather than being held until the reservation runs out
+        flat_id = SQL.flats.reserve_flat_id()
+        try:
+            SQL.flats.add_flat((flat_id, apartment_id, flat_number, weekly_rent, description))
+        except Exception:
+            SQL.flats.release_flat_id(flat_id)
+            raise
 
         # Clear entry fields after flat creation
         self.clear_fields()
@@ -55,6 +55,22 @@ class Payments(tk.Frame):
         self.details_frame.pack(fill='both', expand=True)
         self.details_frame.tree.focus_set()
 
+    # Shows a payment that has just been added. When it belongs at the top of the records being shown
+    # it is put there without fetching them all again, otherwise the records are fetched again.
+    def show_new_payment(self, payment):
+        self.register_frame.pack_forget()
+        details = self.details_frame
+        if not details.shows_first(payment):
+            self.show_details_frame()
+            return
+
+        item_id = details.insert_payment(payment, index=0)
+        details.pack(fill='both', expand=True)
+        tree = details.tree
+        tree.selection_set(item_id)
+        tree.see(item_id)
+        tree.focus_set()
+
     def delete_payment(self, _event=None):
         tree = self.details_frame.tree
         item_id = tree.selection()
@@ -75,8 +91,10 @@ class Payments(tk.Frame):
             f"{'Payment Time:':20}\t{record[5]}")
 
         if messagebox.askyesno(title='Confirm Deletion', message=msg):
-            tree.delete(item_id)
-            SQL.payments.delete_payment(payment_id, record[0])
+            SQL.payments.delete_payment(payment_id)
+            # A listing may have refilled the tree whilst the dialog was open, replacing the selected row
+            if tree.exists(item_id):
+                tree.delete(item_id)
             self.show_details_frame()
 
             messagebox.showinfo(title="Successful Deletion",
@@ -97,13 +115,22 @@ class PaymentDetails(tk.Frame):
                             "Amount": "TotalPaid"}
 
         self.payment_ids = {}
+        self.shown_payments = set()  # the IDs of the payments in the tree, so a page never adds one twice
         self.search_field = "Payee"
         self.type_search = ['*', 'Inbound', 'Outbound']
         self.search_term = ''  # This is used to prevent constant queries to the database when spam clicking 'search'
         self.datetime_sorts = {'Date': 'DESC',
                                'Time': 'DESC'}
+        self.column_sort = None  # (header name, direction) when sorting by Payee, Method or Amount before date and time
         self.header_names = ("Type", "Payee", "Method", "Amount", "Date", "Time")
 
+        # The payments are shown a page at a time, the next page being fetched when the user scrolls to the bottom.
+        # 'listing' is the arguments of the listing being shown, so pages of a listing that has since been
+        # replaced (for example by sorting again) are thrown away, and 'next_page' is the cursor of the next page.
+        self.listing = None
+        self.next_page = None
+        self.loading_page = False
+
         # Creating the widgets
         self.search_options_var = tk.StringVar()
         self.search_options = ttk.OptionMenu(self, self.search_options_var, self.header_names[0], *self.header_names,
@@ -167,7 +194,12 @@ class PaymentDetails(tk.Frame):
         self.rowconfigure(1, weight=1)
         self.columnconfigure(1, weight=1)
 
-        self.tree.config(xscrollcommand=x_scrollbar.set, yscrollcommand=y_scrollbar.set)
+        def scrolled(first, last):
+            y_scrollbar.set(first, last)
+            if float(last) >= 1.0:
+                self.load_next_page()
+
+        self.tree.config(xscrollcommand=x_scrollbar.set, yscrollcommand=scrolled)
 
         # Adding the records into the tree and sorting them by payment ID
         self.sort_records()
@@ -192,6 +224,7 @@ class PaymentDetails(tk.Frame):
         self.search_bar.delete(0, 'end')
         self.type_search = ['*', 'Inbound', 'Outbound']
 
+        self.clear_column_sort()
         self.datetime_sorts = {'Date': 'DESC',
                                'Time': 'DESC'}
         self.tree.heading('Date', text="Date ▲")
@@ -202,14 +235,28 @@ class PaymentDetails(tk.Frame):
 
         messagebox.showinfo(title='Refreshed', message="Successfully refreshed records!")
 
+    def clear_column_sort(self):
+        if self.column_sort:
+            self.tree.heading(self.column_sort[0], text=self.column_sort[0])
+        self.column_sort = None
+
     def sort_records(self, header_name=''):
         if header_name in ('Payee', 'Method', 'Amount'):
-            return
+            # Clicking the same column again swaps the direction
+            if self.column_sort == (header_name, 'ASC'):
+                direction = 'DESC'
+            else:
+                direction = 'ASC'
+            self.clear_column_sort()
+            self.column_sort = (header_name, direction)
+            self.tree.heading(header_name, text=header_name + (" ▼" if direction == 'ASC' else " ▲"))
 
         elif header_name == 'Type':
             self.type_search = self.type_search[1:] + [self.type_search.pop(0)]
 
         elif header_name in ('Date', 'Time'):
+            # Sorting by date or time puts them first again
+            self.clear_column_sort()
             current_sort = self.datetime_sorts[header_name]
             if current_sort == 'ASC':
                 self.datetime_sorts[header_name] = 'DESC'
@@ -218,19 +265,65 @@ class PaymentDetails(tk.Frame):
                 self.datetime_sorts[header_name] = 'ASC'
                 self.tree.heading(header_name, text=header_name + " ▼")
 
-        records = SQL.payments.get_payments(self.type_search[0], self.datetime_sorts,
-                                            self.search_field, self.search_term)
+        column_sort = None
+        if self.column_sort:
+            header, direction = self.column_sort
+            column_sort = (self.field_names.get(header, f"Payment{header}"), direction)
 
-        self.tree.delete(*self.tree.get_children())
-        self.payment_ids = {}
-        for payment in records:
-            payment = [f"{val}" if type(val) != float
-                       else f"+£{val:.2f}" if payment[1] == "Inbound"
-                       else f"- £{val:.2f}"
-                       for val in payment]
+        self.listing = (self.type_search[0], dict(self.datetime_sorts), self.search_field, self.search_term,
+                        column_sort)
+        self.next_page = None
+        self.load_page(self.listing, cursor=None)
 
-            item_id = self.tree.insert("", index='end', values=payment[1:])
-            self.payment_ids[item_id] = payment[0]
+    # The pages are fetched on the database thread so the window doesn't freeze on large tables
+    def load_page(self, listing, cursor):
+        self.loading_page = True
+        page = SQL.nonblocking.payments.get_payments_page(*listing, cursor=cursor)
+        SQL.executor.when_done(self, page, lambda result: self.insert_records(listing, result, cursor is None))
+
+    def load_next_page(self):
+        if self.next_page is not None and not self.loading_page:
+            self.load_page(self.listing, self.next_page)
+
+    def insert_records(self, listing, page, first_page):
+        if listing is not self.listing:
+            return
+        self.loading_page = False
+        self.next_page = page.next
+
+        if first_page:
+            self.tree.delete(*self.tree.get_children())
+            self.payment_ids = {}
+            self.shown_payments = set()
+        for payment in page.records:
+            if payment.PaymentID not in self.shown_payments:
+                self.insert_payment(payment)
+
+    # Whether a payment belongs first in the records being shown, which is only the case when they are
+    # all payments of its type, newest first, and it is at least as new as the payment shown first.
+    def shows_first(self, payment):
+        if self.type_search[0] not in ('*', payment.PaymentType) or self.search_term or self.column_sort:
+            return False
+        if self.datetime_sorts != {'Date': 'DESC', 'Time': 'DESC'}:
+            return False
+
+        items = self.tree.get_children()
+        if not items:
+            return True
+        first_date, first_time = self.tree.item(items[0], 'values')[4:6]
+        return (payment.PaymentDate, payment.PaymentTime) >= (first_date, first_time)
+
+    # Adds a payment (a SQL.records.PaymentRow) to the tree, returning its item ID
+    def insert_payment(self, payment, index='end'):
+        values = [f"{val}" if type(val) != float
+                  else f"+£{val:.2f}" if payment.PaymentType == "Inbound"
+                  else f"- £{val:.2f}"
+                  for val in payment[1:]]
+
+        item_id = self.tree.insert("", index=index, values=values)
+        self.payment_ids[item_id] = f"{payment.PaymentID}"
+        self.shown_payments.add(payment.PaymentID)
+        return item_id
 
     def menu_popup(self, event):
         item_id = self.tree.identify_row(event.y)
@@ -396,13 +489,14 @@ class RegisterPayment(tk.Frame):
 
         description = self.description.get('1.0', tk.END)
         record = (payment_type, method, amount, date, time, description)
-        SQL.payments.add_payment(record, payee[0])
+        payment_id = SQL.payments.add_payment(record, payee[0])
 
         # Clear entry fields after account creation
         self.clear_fields()
 
         self.response['text'] = ""
-        self.master.show_details_frame()
+        self.master.show_new_payment(SQL.records.PaymentRow(payment_id, payment_type, payee[1], method,
+                                                            float(amount), date, time))
         messagebox.showinfo(title="Successfully added payment!",
                             message="Payment has been successfully added to the database.")
 
@@ -513,18 +607,17 @@ class EditPayment(tk.Frame):
         self.payment_type.insert(0, payment_type)
         self.payment_type.config(state='readonly')
 
-        record = SQL.payments.get_payment(payment_id, payment_type)[0]
-        self.set_payees(payment_type, record[0])
-        self.method.insert(0, record[1])
-        self.amount.insert(0, record[2])
-        self.date.insert(0, record[3])
-        self.time.insert(0, record[4])
-        self.description.insert('1.0', record[5])
+        record = SQL.payments.get_payment(payment_id)[0]
+        self.set_payees(payment_type, record.Payee)
+        self.method.insert(0, record.PaymentMethod)
+        self.amount.insert(0, record.TotalPaid)
+        self.date.insert(0, record.PaymentDate)
+        self.time.insert(0, record.PaymentTime)
+        self.description.insert('1.0', record.PaymentDescription)
 
     def edit_payment(self, _event=None):
         self.response['foreground'] = 'red'
 
-        payment_type = self.payment_type.get()
         method = self.method.get().title()
         if not method:
             self.response['text'] = "Payment method is empty."
@@ -564,7 +657,7 @@ class EditPayment(tk.Frame):
 
         payee_id = self.payee[0].get().split(' ', 1)[0]
         record = (method, amount, date, time, description)
-        SQL.payments.edit_payment(self.payment_id, payment_type, record, payee_id)
+        SQL.payments.edit_payment(self.payment_id, record, payee_id)
 
         self.response['text'] = ""
         self.master.show_details_frame()
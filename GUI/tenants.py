@@ -210,7 +210,7 @@ class TenantDetails(tk.Frame):
 
     def sort_records(self, sort_field="TenantID"):
         records = SQL.tenants.get_tenants(self.field_names.get(sort_field, f"Tenant{sort_field}"),
-                                          self.search_field, self.search_term)
+                                          self.search_field, self.search_term, stream=True)
 
         previous_sort_field = self.previous_sort_fields[1]
         if previous_sort_field:
@@ -487,12 +487,12 @@ class EditTenant(tk.Frame):
         self.tenant_id.config(state='readonly')
 
         record = SQL.tenants.get_tenant(tenant_id)[0]
-        self.forename.insert(0, record[0])
-        self.surname.insert(0, record[1])
-        self.contact.insert(0, record[2])
-        self.address.set(record[3] if record[3] is not None else "Select Address")
-        self.flat_number.insert(0, record[4] if record[4] is not None else '')
-        self.description.insert('1.0', record[5])
+        self.forename.insert(0, record.TenantForename)
+        self.surname.insert(0, record.TenantSurname)
+        self.contact.insert(0, record.TenantContact)
+        self.address.set(record.ApartmentAddress if record.ApartmentAddress is not None else "Select Address")
+        self.flat_number.insert(0, record.FlatNumber if record.FlatNumber is not None else '')
+        self.description.insert('1.0', record.TenantDescription)
 
     def edit_tenant(self, _event=None):
         self.response['foreground'] = 'red'
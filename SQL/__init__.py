@@ -4,10 +4,23 @@ Whenever 'SQL' is imported in a higher level directory, this script is run to re
 all the modules from the 'SQL' directory and make them usable to modules in higher level directories.
 """
 from . import main
+from . import profiles
+from . import stats
+from . import executor
+from . import records
+from . import ids
+from . import pages
 
 from . import users
 from . import employees
 from . import payments
 from . import tenants
 from . import apartments
-from . import flats
\ No newline at end of file
+from . import flats
+from . import search
+from . import migrations
+
+# Non-blocking versions of the modules above, where every function runs on the database thread
+# and returns a Future, for example SQL.nonblocking.payments.get_payments(...)
+nonblocking = executor.nonblocking(users, employees, payments, tenants, apartments, flats,
+                                  search)
@@ -1,70 +1,110 @@
-from .main import process_sql
+from . import ids, pages, queries
+from .main import process_sql, process_many, transaction
 
 
 # This function gets the next free apartment ID so that the Add frame
 # can automatically fill the ID when the user wants to create a new apartment.
 def get_free_apartment_id():
-    apartment_ids = (record[0] for record in process_sql("SELECT ApartmentID FROM ApartmentTbl ORDER BY ApartmentID"))
+    return ids.get_free_id("A")
 
-    index = -1
-    for index, apartment_id in enumerate(apartment_ids):
-        if f"A{index:04}" != apartment_id:
-            return f"A{index:04}"
-    return f"A{index+1:04}"
+
+# This function reserves the next free apartment ID so that it can't be taken by anyone else before it is used.
+def reserve_apartment_id():
+    return ids.reserve_id("A")
+
+
+# The columns the apartment listing can be sorted by, and the text and number columns it can be searched by
+APARTMENT_FIELDS = ("ApartmentID", "NumFlats", "NumTenants", "Upkeep", "ApartmentAddress", "ApartmentPostcode")
+APARTMENT_SEARCH_FIELDS = ("ApartmentID", "ApartmentAddress", "ApartmentPostcode")
+APARTMENT_NUMBER_FIELDS = ("NumFlats", "NumTenants", "Upkeep")
+
+# The totals are kept up to date by triggers (see SQL.tables), so the listing is a plain read of one table.
+APARTMENTS_SQL = """SELECT ApartmentID, NumFlats, NumTenants, Upkeep, ApartmentAddress, ApartmentPostcode
+                  FROM ApartmentTbl"""
+
+APARTMENT_SEARCHES = {**queries.searches(APARTMENT_SEARCH_FIELDS, "WHERE"),
+                      **queries.number_searches(APARTMENT_NUMBER_FIELDS, "WHERE")}
+
+queries.define("apartments", APARTMENTS_SQL + """{search}
+                                ORDER BY {sort}""",
+               search=APARTMENT_SEARCHES,
+               sort={**queries.columns(APARTMENT_FIELDS), "ApartmentID": queries.id_order("ApartmentID")})
+
+# The keys each sort of the apartment listing is paged by (see SQL.pages),
+# the apartments with the same value being kept in ID order.
+APARTMENT_PAGE_SORTS = pages.sorts(APARTMENT_FIELDS,
+                                   (pages.key("ApartmentID", expression="length({})"), pages.key("ApartmentID")))
+
+queries.define("apartments_page", pages.template(APARTMENTS_SQL + "{search}"),
+               search=APARTMENT_SEARCHES,
+               page=pages.options(APARTMENT_PAGE_SORTS))
+
+
+def _search(search_field, search_term):
+    if search_term not in ("*", "") and search_field in APARTMENT_NUMBER_FIELDS:
+        operator, params = queries.parse_number_search(search_term)
+        return (search_field, operator), params
+    elif search_term not in ("*", ""):
+        return search_field, (f"{search_term}%",)
+    return None, ()
 
 
 # This function gets all of the apartment records alongside any other information required from the database
 # and is used to handle searching and sorting so that only the records the user wants to see are fetched.
 def get_apartments(sort_field, search_field, search_term):
-    sql = f"""SELECT ApartmentID, COUNT(FlatID) AS NumFlats, COALESCE(SUM(NumFlatTenants), 0) AS NumTenants, 
-                     COALESCE(SUM(WeeklyRent), 0.00) AS Upkeep, ApartmentAddress, ApartmentPostcode
-              FROM (ApartmentTbl LEFT JOIN 
-                   (SELECT FlatApartmentTbl.ApartmentID AS FlatApartmentID, 
-                           FlatApartmentTbl.FlatID AS FlatID, 
-                           COUNT(TenantTbl.TenantID) AS NumFlatTenants,
-                           FlatApartmentTbl.WeeklyRent AS WeeklyRent
-                    FROM (FlatApartmentTbl LEFT JOIN TenantTbl
-                          ON FlatApartmentTbl.FlatID = TenantTbl.FlatID)
-                    GROUP BY FlatApartmentTbl.FlatID)
-                    ON ApartmentID = FlatApartmentID)"""
-
-    params = tuple()
-    if search_term not in ("*", "") and search_field not in ("NumFlats", "NumTenants", "Upkeep"):
-        params = (f"{search_term}%",)
-        sql += f"\nWHERE {search_field} LIKE ? COLLATE NOCASE"
-    sql += f"\nGROUP BY ApartmentID" \
-           f"\nORDER BY {sort_field}"
-
-    records = process_sql(sql, parameters=params)
-    if search_term in ("*", "") or search_field not in ("NumFlats", "NumTenants", "Upkeep"):
-        return records
-
-    index = {"NumFlats": 1, "NumTenants": 2, "Upkeep": 3}.get(search_field)
-    return (record for record in records if f"{record[index]:.2f}".startswith(search_term))
+    search, params = _search(search_field, search_term)
+    sql = queries.get("apartments", search=search, sort=sort_field)
+
+    return process_sql(sql, parameters=params, read_only=True)
+
+
+# This function gets one page of the apartment listing as a SQL.pages.Page, carrying on from
+# the cursor of the page before it (or after it, if 'direction' is "previous").
+def get_apartments_page(sort_field, search_field, search_term, cursor=None, direction="next",
+                        page_size=pages.PAGE_SIZE):
+    search, params = _search(search_field, search_term)
+    return pages.get_page("apartments_page", APARTMENT_PAGE_SORTS, sort_field, params, cursor, direction,
+                          page_size, search=search)
 
 
 # This function gets a specific apartment and its details using the apartment ID to get the record.
 def get_apartment(apartment_id):
-    sql = f"""SELECT COUNT(FlatID) AS NumFlats, COALESCE(SUM(NumFlatTenants), 0) AS NumTenants, 
-                     COALESCE(SUM(WeeklyRent), 0.00) AS Upkeep, 
+    sql = """SELECT NumFlats, NumTenants, Upkeep, ApartmentAddress, ApartmentPostcode, ApartmentDescription
+             FROM ApartmentTbl
+             WHERE ApartmentID = ?"""
+
+    return process_sql(sql, parameters=(apartment_id,), read_only=True)
+
+
+# These functions check for apartments without fetching them, for validation. EXISTS stops at the first row
+# it finds, which for an ID is looked up in its unique index, so they take the same time however many there are.
+def apartment_exists(apartment_id):
+    sql = "SELECT EXISTS(SELECT 1 FROM ApartmentTbl WHERE ApartmentID = ?)"
+    return bool(process_sql(sql, parameters=(apartment_id,), read_only=True)[0][0])
+
+
+def apartments_exist():
+    return bool(process_sql("SELECT EXISTS(SELECT 1 FROM ApartmentTbl)", read_only=True)[0][0])
+
+
+def get_num_apartments():
+    return process_sql("SELECT COUNT(*) FROM ApartmentTbl", read_only=True)[0][0]
+
+
+# This function gets many apartments at once as a dictionary keyed by apartment ID,
+# leaving out the IDs that aren't in the database.
+def get_apartments_by_ids(apartment_ids):
+    sql = f"""SELECT ApartmentID, NumFlats, NumTenants, Upkeep,
                      ApartmentAddress, ApartmentPostcode, ApartmentDescription
-              FROM (ApartmentTbl LEFT JOIN 
-                   (SELECT FlatApartmentTbl.ApartmentID AS FlatApartmentID, 
-                           FlatApartmentTbl.FlatID AS FlatID, 
-                           COUNT(TenantTbl.TenantID) AS NumFlatTenants,
-                           FlatApartmentTbl.WeeklyRent AS WeeklyRent
-                    FROM (FlatApartmentTbl LEFT JOIN TenantTbl
-                          ON FlatApartmentTbl.FlatID = TenantTbl.FlatID)
-                    GROUP BY FlatApartmentTbl.FlatID)
-                    ON ApartmentID = FlatApartmentID)
-              WHERE ApartmentID = ?
-              GROUP BY ApartmentID"""
+              FROM ApartmentTbl
+              WHERE ApartmentID {queries.IN_LIST}"""
 
-    return process_sql(sql, parameters=(apartment_id,))
+    records = process_sql(sql, parameters=(queries.json_list(apartment_ids),), read_only=True)
+    return {record.ApartmentID: record for record in records}
 
 
 def get_addresses():
-    return (record[0] for record in process_sql("SELECT ApartmentAddress FROM ApartmentTbl"))
+    return (record[0] for record in process_sql("SELECT ApartmentAddress FROM ApartmentTbl", read_only=True))
 
 
 def add_apartment(record):
@@ -74,6 +114,18 @@ def add_apartment(record):
     process_sql(sql, parameters=record)
 
 
+# This function adds many apartments at once in a single transaction,
+# returning the IDs of the apartments added in the same order as the records given.
+def add_apartments(records):
+    records = list(records)
+    sql = """INSERT INTO ApartmentTbl(ApartmentID, ApartmentAddress, 
+                                      ApartmentPostcode, ApartmentDescription)
+             VALUES (?, ?, ?, ?)"""
+    with transaction():
+        process_many(sql, records)
+    return [record[0] for record in records]
+
+
 def edit_apartment(apartment_id, record):
     sql = """UPDATE ApartmentTbl SET
              ApartmentAddress = ?,
@@ -83,17 +135,8 @@ def edit_apartment(apartment_id, record):
     process_sql(sql, parameters=(*record, apartment_id))
 
 
-# This function deletes an apartment from the database, as well as
-# deleting all of its corresponding flats and unbinding those flats
-# from the tenants that have them as a foreign key.
+# This function deletes an apartment from the database. Its flats are deleted along with it
+# and their tenants are left without a flat, by the foreign keys on those tables (see SQL.tables),
+# so the whole apartment is deleted by one statement.
 def delete_apartment(apartment_id):
-    flat_ids = process_sql("SELECT FlatID FROM FlatApartmentTbl WHERE ApartmentID = ?",
-                           parameters=(apartment_id,))
-    for flat_id in flat_ids:
-        sql = f"""UPDATE TenantTbl SET
-                 FlatID = NULL
-                 WHERE FlatID = ?"""
-        process_sql(sql, parameters=flat_id)
-
-    process_sql("DELETE FROM FlatApartmentTbl WHERE ApartmentID = ?", parameters=(apartment_id,))
     process_sql("DELETE FROM ApartmentTbl WHERE ApartmentID = ?", parameters=(apartment_id,))
@@ -1,32 +1,66 @@
-from .main import process_sql
+from . import ids, pages, queries
+from .main import process_sql, process_many, stream_sql, transaction
 
 
 # This function gets the next free employee ID so that the Add frame
 # can automatically fill the ID when the user wants to create a new employee.
 def get_free_employee_id():
-    employee_ids = (record[0] for record in process_sql("SELECT EmployeeID FROM EmployeeTbl ORDER BY EmployeeID"))
+    return ids.get_free_id("E")
 
-    index = -1
-    for index, employee_id in enumerate(employee_ids):
-        if f"E{index:04}" != employee_id:
-            return f"E{index:04}"
-    return f"E{index+1:04}"
+
+# This function reserves the next free employee ID so that it can't be taken by anyone else before it is used.
+def reserve_employee_id():
+    return ids.reserve_id("E")
+
+
+# The columns the employee listing can be sorted and searched by
+EMPLOYEE_FIELDS = ("EmployeeID", "EmployeeForename", "EmployeeSurname",
+                   "EmployeeContact", "EmployeeAddress", "EmployeePostcode")
+
+EMPLOYEES_SQL = """SELECT EmployeeID, EmployeeForename, EmployeeSurname, 
+                        EmployeeContact, EmployeeAddress, EmployeePostcode
+                 FROM EmployeeTbl"""
+
+queries.define("employees", EMPLOYEES_SQL + """{search}
+                               ORDER BY {sort}""",
+               search=queries.searches(EMPLOYEE_FIELDS, "WHERE"),
+               sort={**queries.columns(EMPLOYEE_FIELDS), "EmployeeID": queries.id_order("EmployeeID")})
+
+# The keys each sort of the employee listing is paged by (see SQL.pages),
+# the employees with the same value being kept in ID order.
+EMPLOYEE_PAGE_SORTS = pages.sorts(EMPLOYEE_FIELDS,
+                                  (pages.key("EmployeeID", expression="length({})"), pages.key("EmployeeID")))
+
+queries.define("employees_page", pages.template(EMPLOYEES_SQL + "{search}"),
+               search=queries.searches(EMPLOYEE_FIELDS, "WHERE"),
+               page=pages.options(EMPLOYEE_PAGE_SORTS))
+
+
+def _search(search_field, search_term):
+    if search_term not in ("*", ""):
+        return search_field, (f"{search_term}%",)
+    return None, ()
 
 
 # This function gets all of the employee records from the database
 # and is used to handle searching and sorting so that only the records the user wants to see are fetched.
-def get_employees(sort_field, search_field, search_term):
-    sql = f"""SELECT EmployeeID, EmployeeForename, EmployeeSurname, 
-                     EmployeeContact, EmployeeAddress, EmployeePostcode
-              FROM EmployeeTbl"""
+# If 'stream' is True the records are returned as an iterator which fetches them in batches.
+def get_employees(sort_field, search_field, search_term, stream=False):
+    search_field, params = _search(search_field, search_term)
+    sql = queries.get("employees", search=search_field, sort=sort_field)
+
+    if stream:
+        return stream_sql(sql, parameters=params)
+    return process_sql(sql, parameters=params, read_only=True)
 
-    params = tuple()
-    if search_term not in ("*", ""):
-        params = (f"{search_term}%",)
-        sql += f"\nWHERE {search_field} LIKE ? COLLATE NOCASE"
-    sql += f"\nORDER BY {sort_field}"
 
-    return process_sql(sql, parameters=params)
+# This function gets one page of the employee listing as a SQL.pages.Page, carrying on from
+# the cursor of the page before it (or after it, if 'direction' is "previous").
+def get_employees_page(sort_field, search_field, search_term, cursor=None, direction="next",
+                       page_size=pages.PAGE_SIZE):
+    search_field, params = _search(search_field, search_term)
+    return pages.get_page("employees_page", EMPLOYEE_PAGE_SORTS, sort_field, params, cursor, direction, page_size,
+                          search=search_field)
 
 
 # This function gets a specific employee's details using the employee ID to get the record.
@@ -36,7 +70,29 @@ def get_employee(employee_id):
              FROM EmployeeTbl
              WHERE EmployeeID = ?"""
 
-    return process_sql(sql, parameters=(employee_id,))
+    return process_sql(sql, parameters=(employee_id,), read_only=True)
+
+
+# This function gets many employees at once as a dictionary keyed by employee ID,
+# leaving out the IDs that aren't in the database.
+def get_employees_by_ids(employee_ids):
+    sql = f"""SELECT EmployeeID, EmployeeForename, EmployeeSurname, EmployeeContact,
+                     EmployeeAddress, EmployeePostcode, EmployeeDescription
+              FROM EmployeeTbl
+              WHERE EmployeeID {queries.IN_LIST}"""
+
+    records = process_sql(sql, parameters=(queries.json_list(employee_ids),), read_only=True)
+    return {record.EmployeeID: record for record in records}
+
+
+# These functions check for employees without fetching them, for validation.
+def employee_exists(employee_id):
+    sql = "SELECT EXISTS(SELECT 1 FROM EmployeeTbl WHERE EmployeeID = ?)"
+    return bool(process_sql(sql, parameters=(employee_id,), read_only=True)[0][0])
+
+
+def get_num_employees():
+    return process_sql("SELECT COUNT(*) FROM EmployeeTbl", read_only=True)[0][0]
 
 
 def add_employee(record):
@@ -47,6 +103,19 @@ def add_employee(record):
     process_sql(sql, parameters=record)
 
 
+# This function adds many employees at once in a single transaction,
+# returning the IDs of the employees added in the same order as the records given.
+def add_employees(records):
+    records = list(records)
+    sql = """INSERT INTO EmployeeTbl(EmployeeID, 
+                                     EmployeeForename, EmployeeSurname, EmployeeContact, 
+                                     EmployeeAddress, EmployeePostcode, EmployeeDescription)
+             VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    with transaction():
+        process_many(sql, records)
+    return [record[0] for record in records]
+
+
 def edit_employee(employee_id, record):
     sql = """UPDATE EmployeeTbl SET
              EmployeeForename = ?,
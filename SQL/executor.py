@@ -0,0 +1,102 @@
+"""
+This file contains the database executor, which runs queries on a dedicated background thread
+so that the window doesn't freeze while they run. Work sent to it returns a Future straight away,
+which can be awaited with asyncio, or handed to when_done() to get the result back on the Tk thread.
+"""
+import sys
+import queue
+import asyncio
+import functools
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# How often (in milliseconds) the Tk thread checks for finished work while any is outstanding
+POLL_INTERVAL = 20
+
+# The executor is only started the first time it is used
+_executor = None
+
+# Finished work waiting to be handed back to the Tk thread, and how many callbacks are still to come.
+# _pending is only ever used from the Tk thread.
+_completed = queue.Queue()
+_pending = 0
+
+
+# A single worker thread is used so that requests are run (and finish) in the order they were sent
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+    return _executor
+
+
+# Runs a function on the database thread, returning a Future for its result.
+def submit(function, *args, **kwargs):
+    return get_executor().submit(function, *args, **kwargs)
+
+
+# The asyncio version of submit(), for use as: records = await SQL.executor.run(SQL.tenants.get_tenants, ...)
+async def run(function, *args, **kwargs):
+    return await asyncio.wrap_future(submit(function, *args, **kwargs))
+
+
+# Calls callback(result) on the Tk thread once the future has finished, as tkinter widgets
+# must only be used from the thread running the main loop. The callback is skipped
+# if the widget has been destroyed in the meantime (for example after changing page).
+# The polling is scheduled on the root window, as destroying a widget cancels the 'after' callbacks
+# scheduled on it, which would leave _pending above 0 and stop any later callbacks from ever running.
+def when_done(widget, future, callback):
+    global _pending
+    _pending += 1
+    if _pending == 1:
+        root = widget.nametowidget('.')
+        root.after(POLL_INTERVAL, _dispatch, root)
+    future.add_done_callback(lambda done: _completed.put((widget, done, callback)))
+
+
+def _dispatch(root):
+    global _pending
+    while True:
+        try:
+            widget, future, callback = _completed.get_nowait()
+        except queue.Empty:
+            break
+
+        _pending -= 1
+        if not widget.winfo_exists():
+            continue
+        try:
+            callback(future.result())
+        except Exception:
+            # Errors are shown the same way as errors in any other tkinter callback
+            root.report_callback_exception(*sys.exc_info())
+
+    if _pending:
+        root.after(POLL_INTERVAL, _dispatch, root)
+
+
+# Waits for any outstanding work to finish and stops the database thread.
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+# This function makes a non-blocking copy of SQL modules, where every function
+# submits itself to the database thread and returns a Future instead of its result.
+def nonblocking(*modules):
+    namespace = SimpleNamespace()
+    for module in modules:
+        functions = {name: _submitter(function) for name, function in vars(module).items()
+                     if callable(function) and not name.startswith('_')
+                     and getattr(function, '__module__', None) == module.__name__}
+        setattr(namespace, module.__name__.rsplit('.', 1)[-1], SimpleNamespace(**functions))
+    return namespace
+
+
+def _submitter(function):
+    @functools.wraps(function)
+    def submit_function(*args, **kwargs):
+        return submit(function, *args, **kwargs)
+    return submit_function
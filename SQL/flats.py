@@ -1,69 +1,151 @@
-from .main import process_sql
+from . import ids, pages, queries
+from .main import process_sql, process_many, transaction
 
 
 # This function gets the next free flat ID so that the Add frame
 # can automatically fill the ID when the user wants to create a new flat.
 def get_free_flat_id():
-    flat_ids = (record[0] for record in process_sql("SELECT FlatID FROM FlatApartmentTbl ORDER BY FlatID"))
+    return ids.get_free_id("F")
 
-    index = -1
-    for index, flat_id in enumerate(flat_ids):
-        if f"F{index:04}" != flat_id:
-            return f"F{index:04}"
-    return f"F{index+1:04}"
+
+# This function reserves the next free flat ID so that it can't be taken by anyone else before it is used.
+def reserve_flat_id():
+    return ids.reserve_id("F")
+
+
+# This function gives back a reserved flat ID that wasn't used, so it is free again straight away.
+def release_flat_id(flat_id):
+    ids.release_id(flat_id)
+
+
+# The columns the flat listing can be sorted and searched by.
+# NumTenants is kept up to date by triggers (see SQL.tables), so it can be searched like any other column.
+FLAT_FIELDS = ("FlatNumber", "NumTenants", "Tenants", "WeeklyRent")
+FLAT_SEARCH_FIELDS = ("FlatNumber", "NumTenants")
+
+
+# The rent is searched as a number (see SQL.queries.parse_number_search).
+# The tenants are searched by a list of names, where every name has to be the start of one
+# of the flat's tenants' full names. The names are passed in as a JSON list so that
+# any number of them can be searched for with the same query.
+def _flat_searches():
+    searches = queries.searches(FLAT_SEARCH_FIELDS, "AND")
+    searches.update(queries.number_searches(("WeeklyRent",), "AND"))
+    searches["Tenants"] = """
+                           AND NOT EXISTS (SELECT 1 FROM json_each(?) AS Name
+                                           WHERE NOT EXISTS (SELECT 1 FROM TenantTbl
+                                                             WHERE TenantTbl.FlatKey = FlatApartmentTbl.FlatKey
+                                                             AND (TenantForename || ' ' || TenantSurname)
+                                                                 LIKE Name.value ESCAPE '\\'))"""
+    return searches
+
+
+# The names of each flat's tenants are joined together in SQL, looking them up with the index on FlatKey.
+FLATS_SQL = """SELECT FlatNumber, NumTenants,
+                      (SELECT group_concat(TenantForename || ' ' || TenantSurname, ', ')
+                       FROM TenantTbl
+                       WHERE TenantTbl.FlatKey = FlatApartmentTbl.FlatKey) AS Tenants,
+                      WeeklyRent
+               FROM FlatApartmentTbl
+               WHERE ApartmentKey = (SELECT ApartmentKey FROM ApartmentTbl
+                                     WHERE ApartmentID = ?)"""
+
+queries.define("flats", FLATS_SQL + """{search}
+                           ORDER BY {sort}""",
+               search=_flat_searches(),
+               sort=queries.columns(FLAT_FIELDS))
+
+# The keys each sort of the flat listing is paged by (see SQL.pages). No two flats in an apartment
+# have the same number, so the flats with the same value are kept in flat number order.
+FLAT_PAGE_SORTS = pages.sorts(FLAT_FIELDS, (pages.key("FlatNumber"),), nullable=("Tenants",))
+
+queries.define("flats_page", pages.template(FLATS_SQL + "{search}"),
+               search=_flat_searches(),
+               page=pages.options(FLAT_PAGE_SORTS))
+
+
+def _search(apartment_id, search_field, search_term):
+    if search_term in ('*', ''):
+        return None, (apartment_id,)
+    if search_field == "Tenants":
+        names = [queries.like_prefix(name.strip()) for name in search_term.split(',')]
+        return search_field, (apartment_id, queries.json_list(names))
+    if search_field == "WeeklyRent":
+        operator, numbers = queries.parse_number_search(search_term)
+        return (search_field, operator), (apartment_id, *numbers)
+    return search_field, (apartment_id, search_term)
 
 
 # This function gets all of the flat records from the database
 # and is used to handle searching and sorting so that only the records the user wants to see are fetched.
 def get_flats(apartment_id, sort_field, search_field, search_term):
-    parameters = (apartment_id,)
-    search = ''
-    if search_term not in ('*', '') and search_field not in ("Tenants", "WeeklyRent"):
-        parameters = (apartment_id, search_term)
-        search = f'AND {search_field} LIKE ? COLLATE NOCASE'
-
-    sql = f"""SELECT FlatApartmentTbl.FlatID, FlatNumber, 
-              COUNT(TenantTbl.TenantID) AS NumTenants, WeeklyRent
-              FROM (FlatApartmentTbl LEFT JOIN TenantTbl
-                    ON FlatApartmentTbl.FlatID = TenantTbl.FlatID)
-              WHERE ApartmentID = ? {search}
-              GROUP BY FlatApartmentTbl.FlatID
-              ORDER BY {sort_field}"""
-
-    records = []
-    for record in process_sql(sql, parameters=parameters):
-        if search_term not in ('*', '') and search_field == "WeeklyRent":
-            if not f"{record[3]:.2f}".startswith(search_term):
-                continue
-
-        sql = f"""SELECT TenantForename || ' ' || TenantSurname
-                  FROM TenantTbl
-                  WHERE FlatID = ?"""
-        names = [name[0] for name in process_sql(sql, parameters=(record[0],))]
-        if search_term not in ('*', '') and search_field == "Tenants":
-            # This handles the searching for flats that have the specified tenants linked to them
-            if not all(any(record_name.lower().startswith(name.strip()) for record_name in names)
-                       for name in search_term.lower().split(',')):
-                continue
-
-        record = (*record[1:3], ', '.join(names) or None, record[3])
-        records.append(record)
-    return records
+    search, parameters = _search(apartment_id, search_field, search_term)
+    sql = queries.get("flats", search=search, sort=sort_field)
+
+    return process_sql(sql, parameters=parameters, read_only=True)
+
+
+# This function gets one page of an apartment's flats as a SQL.pages.Page, carrying on from
+# the cursor of the page before it (or after it, if 'direction' is "previous").
+def get_flats_page(apartment_id, sort_field, search_field, search_term, cursor=None, direction="next",
+                   page_size=pages.PAGE_SIZE):
+    search, parameters = _search(apartment_id, search_field, search_term)
+    return pages.get_page("flats_page", FLAT_PAGE_SORTS, sort_field, parameters, cursor, direction, page_size,
+                          search=search)
 
 
 def get_flat_id(apartment_id, flat_number):
-    sql = """SELECT FlatID FROM FlatApartmentTbl
+    sql = """SELECT FlatID FROM (FlatApartmentTbl INNER JOIN ApartmentTbl
+             ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)
              WHERE ApartmentID = ? AND FlatNumber = ?"""
-    return process_sql(sql, parameters=(apartment_id, flat_number))
+    return process_sql(sql, parameters=(apartment_id, flat_number), read_only=True)
+
+
+# This function gets many flats at once as a dictionary keyed by flat ID,
+# leaving out the IDs that aren't in the database.
+def get_flats_by_ids(flat_ids):
+    sql = f"""SELECT FlatID, ApartmentID, FlatNumber, FlatApartmentTbl.NumTenants, WeeklyRent, FlatDescription
+              FROM (FlatApartmentTbl INNER JOIN ApartmentTbl
+              ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)
+              WHERE FlatID {queries.IN_LIST}"""
+
+    records = process_sql(sql, parameters=(queries.json_list(flat_ids),), read_only=True)
+    return {record.FlatID: record for record in records}
+
+
+# This function checks whether an apartment already has a flat with the number, for validation.
+def flat_exists(apartment_id, flat_number):
+    sql = """SELECT EXISTS(SELECT 1 FROM FlatApartmentTbl
+                           WHERE ApartmentKey = (SELECT ApartmentKey FROM ApartmentTbl WHERE ApartmentID = ?)
+                           AND FlatNumber = ?)"""
+    return bool(process_sql(sql, parameters=(apartment_id, flat_number), read_only=True)[0][0])
+
+
+def get_num_flats(apartment_id):
+    sql = """SELECT NumFlats FROM ApartmentTbl WHERE ApartmentID = ?"""
+    records = process_sql(sql, parameters=(apartment_id,), read_only=True)
+    return records[0][0] if records else 0
 
 
 def add_flat(record):
-    sql = """INSERT INTO FlatApartmentTbl(FlatID, ApartmentID, FlatNumber, 
+    sql = """INSERT INTO FlatApartmentTbl(FlatID, ApartmentKey, FlatNumber, 
                                           WeeklyRent, FlatDescription)
-             VALUES (?, ?, ?, ?, ?)"""
+             VALUES (?, (SELECT ApartmentKey FROM ApartmentTbl WHERE ApartmentID = ?), ?, ?, ?)"""
     process_sql(sql, parameters=record)
 
 
+# This function adds many flats at once in a single transaction,
+# returning the IDs of the flats added in the same order as the records given.
+def add_flats(records):
+    records = list(records)
+    sql = """INSERT INTO FlatApartmentTbl(FlatID, ApartmentKey, FlatNumber, 
+                                          WeeklyRent, FlatDescription)
+             VALUES (?, (SELECT ApartmentKey FROM ApartmentTbl WHERE ApartmentID = ?), ?, ?, ?)"""
+    with transaction():
+        process_many(sql, records)
+    return [record[0] for record in records]
+
+
 def edit_flat(flat_id, record):
     sql = """UPDATE FlatApartmentTbl SET
              FlatNumber = ?,
@@ -73,8 +155,7 @@ def edit_flat(flat_id, record):
     process_sql(sql, parameters=(*record, flat_id))
 
 
-# This function deletes a flat from the database, as well as
-# unbinding all of its corresponding tenants that have that flat ID as a foreign key.
+# This function deletes a flat from the database. Its tenants are left without a flat
+# by the foreign key on TenantTbl (see SQL.tables).
 def delete_flat(flat_id):
-    process_sql("UPDATE TenantTbl SET FlatID = NULL WHERE FlatID = ?", parameters=(flat_id,))
     process_sql("DELETE FROM FlatApartmentTbl WHERE FlatID = ?", parameters=(flat_id,))
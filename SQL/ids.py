@@ -0,0 +1,71 @@
+"""
+This file contains the ID allocator, which finds the next free ID (A0000, F0000, T0000, E0000) for a new record.
+The free IDs are kept as ranges of unused numbers by the triggers in SQL.tables, so finding one
+is a single index lookup however many records there are. An ID can also be reserved, so that
+it isn't handed to anyone else (such as another copy of the program) before it is used.
+"""
+import time
+
+from .main import process_sql, transaction
+from .tables import id_columns
+
+# How long (in seconds) a reserved ID is held for if it is never used or released
+RESERVATION_TIMEOUT = 60 * 60
+
+
+# IDs are the letter followed by the number, padded to at least 4 digits
+def format_id(prefix, number):
+    return f"{prefix}{number:04}"
+
+
+def _check_prefix(prefix):
+    if prefix not in id_columns:
+        raise ValueError(f"Unknown ID prefix '{prefix}', expected one of {', '.join(id_columns)}")
+
+
+# This function gets the lowest free ID starting with the letter given, without reserving it.
+def get_free_id(prefix):
+    _check_prefix(prefix)
+    sql = "SELECT MIN(GapStart) FROM IDGapTbl WHERE Prefix = ?"
+    return format_id(prefix, process_sql(sql, parameters=(prefix,), read_only=True)[0][0])
+
+
+# This function reserves the lowest free ID starting with the letter given and returns it.
+# The write transaction makes sure two callers can never reserve the same ID,
+# and the reservation ends as soon as a record with the ID is added.
+def reserve_id(prefix):
+    _check_prefix(prefix)
+    with transaction():
+        _release_expired()
+        number = process_sql("SELECT MIN(GapStart) FROM IDGapTbl WHERE Prefix = ?", parameters=(prefix,))[0][0]
+        process_sql("INSERT INTO IDReservationTbl(Prefix, IDNumber, ReservedAt) VALUES (?, ?, ?)",
+                    parameters=(prefix, number, time.time()))
+    return format_id(prefix, number)
+
+
+# This function gives back a reserved ID that is no longer needed (for example if the Add form was closed).
+# Nothing happens if the ID isn't reserved.
+def release_id(reserved_id):
+    prefix = reserved_id[0]
+    _check_prefix(prefix)
+    with transaction():
+        _release(prefix, int(reserved_id[1:]))
+
+
+# A reserved number only goes back into the gaps if no record has been given it in the meantime
+def _release(prefix, number):
+    process_sql("DELETE FROM IDReservationTbl WHERE Prefix = ? AND IDNumber = ?", parameters=(prefix, number))
+    if not process_sql("SELECT changes()")[0][0]:
+        return
+
+    table, column = id_columns[prefix]
+    if not process_sql(f"SELECT 1 FROM {table} WHERE {column} = ?", parameters=(format_id(prefix, number),)):
+        process_sql("INSERT OR IGNORE INTO IDGapTbl(Prefix, GapStart, GapEnd) VALUES (?, ?, ?)",
+                    parameters=(prefix, number, number))
+
+
+# Reservations that were never used or released (for example if the program was closed) are given back
+def _release_expired():
+    sql = "SELECT Prefix, IDNumber FROM IDReservationTbl WHERE ReservedAt < ?"
+    for prefix, number in process_sql(sql, parameters=(time.time() - RESERVATION_TIMEOUT,)):
+        _release(prefix, number)
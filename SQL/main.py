@@ -1,41 +1,196 @@
+import time
+import pathlib
+import logging
 import sqlite3
-import security
-from .tables import create_tables_SQL
+import threading
+from contextlib import contextmanager
 
-# defining global connection variable for use in neighbouring methods within this module
-global conn
+from . import profiles
+from . import stats
+from . import queries
+from . import executor
+from . import records
+from .pool import ConnectionPool
 
+# defining global connection pool variables for use in neighbouring methods within this module.
+# Reads go through their own read-only connections, so in WAL mode a long listing
+# never holds up a write and a write never holds up a listing.
+global pool
+global read_pool
 
-# method to establish connection to database
-def establish_connection(db_filename):
-    global conn
-    conn = sqlite3.connect(db_filename)
-        
+# how deeply transactions are nested on each thread
+_transactions = threading.local()
 
-# method to close connection to database
+logger = logging.getLogger(__name__)
+
+
+# method to establish the pool of connections to the database.
+# Connections are opened lazily, so at most 'pool_size' threads can use the database at once.
+# 'profile' is the name of one of the performance profiles in SQL/profiles.py
+def establish_connection(db_filename, pool_size=4, profile=profiles.DEFAULT_PROFILE):
+    global pool, read_pool
+    # The statement cache is made big enough to hold every variant of the registered queries, so none of them
+    # are re-parsed (only the statements actually run take up any room in it)
+    cached_statements = max(128, queries.count() + 64)
+    pool = ConnectionPool(db_filename, size=pool_size, setup_sql=profiles.get_pragmas(profile),
+                          cached_statements=cached_statements, row_factory=records.row_factory)
+
+    # Opening the writer first makes sure the database file exists before the read-only connections open it
+    settings = get_settings()
+    read_uri = f"{pathlib.Path(db_filename).absolute().as_uri()}?mode=ro"
+    read_pool = ConnectionPool(read_uri, size=pool_size, uri=True,
+                               setup_sql=profiles.get_pragmas(profile, read_only=True),
+                               cached_statements=cached_statements, row_factory=records.row_factory)
+
+    settings = ', '.join(f"{name}={value}" for name, value in settings.items())
+    logger.info("Opened '%s' with the '%s' profile (%s)", db_filename, profile, settings)
+
+
+# This function reads back the settings that are actually in effect on a connection,
+# as SQLite silently ignores some of them (for example WAL mode on an in-memory database).
+def get_settings():
+    settings = {}
+    with pool.connection() as conn:
+        for name in profiles.PROFILES[profiles.DEFAULT_PROFILE]:
+            settings[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+    return settings
+
+
+# method to close all connections to database.
+# The slowest queries of the session are logged first so they can be looked into.
 def close_connection():
-    conn.close()
+    executor.shutdown()  # any queries still running on the database thread are finished first
+    logger.info("Query statistics for this session:\n%s", stats.dump_stats(limit=20))
+    read_pool.close()
+    pool.close()
+
+
+# Undoes the transaction (or the savepoint, if one is given) after an error. SQLite rolls the whole transaction
+# back by itself after some errors (such as the disk being full), in which case there is nothing left to undo.
+# Any error from the rollback itself is ignored, so that the error which caused it is the one raised.
+def _rollback(conn, savepoint=None):
+    if not conn.in_transaction:
+        return
+    try:
+        if savepoint is None:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+    except sqlite3.Error:
+        logger.exception("Failed to roll back the transaction")
+
+
+# Groups every query run inside the 'with' block into one unit of work which is committed once at the end,
+# or rolled back entirely if an exception is raised. Transactions can be nested, in which case the inner
+# ones become savepoints that can be rolled back without undoing the rest of the outer transaction.
+@contextmanager
+def transaction():
+    with pool.connection() as conn:
+        depth = getattr(_transactions, 'depth', 0)
+        savepoint = f"sp{depth}"
+        # IMMEDIATE takes the write lock straight away, so two writers can't deadlock upgrading their locks
+        conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+
+        _transactions.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            _rollback(conn, savepoint if depth else None)
+            raise
+        else:
+            if depth == 0:
+                try:
+                    conn.execute("COMMIT")
+                except BaseException:
+                    _rollback(conn)
+                    raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+        finally:
+            _transactions.depth = depth
+
+
+# This function chooses which pool a query should use. Reads made inside a transaction use the
+# transaction's own connection, so that they can see the changes it hasn't committed yet.
+def _get_pool(read_only):
+    if read_only and not getattr(_transactions, 'depth', 0):
+        return read_pool
+    return pool
+
+
+# simple helper function for processing SQL queries.
+# The connection used is checked out from the pool for the current thread,
+# so this can safely be called from threads other than the GUI thread.
+# Outside of a transaction() block each statement is committed on its own.
+# Queries which only read should pass read_only=True to use the read-only connections.
+def process_sql(sql, parameters=(), read_only=False):
+    with _get_pool(read_only).connection() as conn:
+        start = time.perf_counter()
+        cur = conn.cursor()
+        cur.execute(sql, parameters)
+
+        # All the records are returned even if they are not needed
+        # As this makes it easier to use the data returned
+        try:
+            rows = cur.fetchall()
+        finally:
+            cur.close()  # The cursor is closed so that the query is processed successfully
+
+        num_rows = len(rows) if cur.description else cur.rowcount
+        stats.record(sql, len(parameters), time.perf_counter() - start, num_rows,
+                     explain=lambda: explain_sql(conn, sql, parameters))
+        return rows
+
+
+# helper function for running the same statement once for every row of parameters in 'rows', such as adding many rows.
+# The statement is only prepared once, and if this is called inside a transaction() block
+# all of the rows are committed together. Returns the total number of rows changed.
+def process_many(sql, rows):
+    rows = list(rows)
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        cur = conn.executemany(sql, rows)
+        try:
+            num_rows = cur.rowcount
+        finally:
+            cur.close()
+
+        stats.record(sql, len(rows[0]) if rows else 0, time.perf_counter() - start, num_rows)
+        return num_rows
+
+
+# Streams the records returned by a query in batches of 'batch_size' instead of fetching them all at once,
+# so that only one batch is held in memory at a time. The cursor is closed as soon as the records run out,
+# or when the caller stops iterating early and the generator is closed or garbage collected.
+# Only the time spent fetching is recorded in the query statistics, not the time the caller spends on each batch.
+# Streams are only used for reading, so they use the read-only connections unless told otherwise.
+def stream_sql(sql, parameters=(), batch_size=500, read_only=True):
+    with _get_pool(read_only).connection() as conn:
+        elapsed = 0.0
+        num_rows = 0
+        cur = conn.cursor()
+        try:
+            start = time.perf_counter()
+            cur.execute(sql, parameters)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    return
 
+                num_rows += len(rows)
+                yield from rows
+                start = time.perf_counter()
+        finally:
+            cur.close()
+            stats.record(sql, len(parameters), elapsed, num_rows,
+                         explain=lambda: explain_sql(conn, sql, parameters))
 
-# simple helper function for processing SQL queries
-def process_sql(sql, parameters=()):
-    cur = conn.cursor()
-    cur.execute(sql, parameters)
-    conn.commit()
 
-    # All the records are returned even if they are not needed
-    # As this makes it easier to use the data returned
+# This function gets the query plan SQLite uses for a query, which shows whether the indexes are being used.
+def explain_sql(conn, sql, parameters=()):
     try:
-        return cur.fetchall()
-    finally:
-        cur.close()  # The cursor is closed so that the query is processed successfully
-
-
-# method to create tables if they do not exist, to be used on program startup
-def create_tables():
-    for sql in create_tables_SQL:
-        process_sql(sql)
-        
-    if not process_sql("Select * FROM LoginTbl"):
-        pwdhash = security.hash_password('password')
-        process_sql("INSERT INTO LoginTbl VALUES (?, ?)", parameters=('admin', pwdhash))
+        return conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return []  # statements such as PRAGMAs don't have a query plan
@@ -0,0 +1,239 @@
+"""
+This file contains the migrations that bring a database up to date with the current version of the program.
+The version a database is at is stored in its 'user_version' header, so on startup only that number is checked,
+and any migrations newer than it are run in order. Every step is safe to run again, so a migration
+that was interrupted part way through (for example by a power cut) simply carries on the next time.
+"""
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+import security
+from . import main
+from .main import process_sql, transaction
+from . import tables
+
+logger = logging.getLogger(__name__)
+
+
+# The different kinds of step a migration is made of. Each returns a function which
+# runs the step, taking a 'progress' function to report how far through it is.
+
+# Statements that are run together in one transaction, so they either all happen or none do.
+def sql_step(*statements):
+    def run(progress):
+        with transaction():
+            for sql in statements:
+                process_sql(sql)
+    return run
+
+
+def _get_columns(table):
+    return {record.name for record in process_sql(f"PRAGMA table_info({table})")}
+
+
+# Adds columns to existing tables, as (table, column definition) pairs. SQLite has no "ADD COLUMN IF NOT EXISTS",
+# so columns that are already there (from an earlier, interrupted run) are skipped.
+def column_step(*columns):
+    def run(progress):
+        with transaction():
+            for table, definition in columns:
+                if definition.split()[0] not in _get_columns(table):
+                    process_sql(f"ALTER TABLE {table} ADD COLUMN {definition}")
+    return run
+
+
+# These tell whether a table has already been rebuilt (see rebuild_step), by whether it has a column
+# only the new table has, or a foreign key the old table didn't have.
+def has_column(column):
+    return lambda table: column in _get_columns(table)
+
+
+def has_on_delete(column, action):
+    # the rows are (id, seq, table, from, to, on_update, on_delete, match)
+    return lambda table: any(key[3] == column and key[6] == action
+                             for key in process_sql(f"PRAGMA foreign_key_list({table})"))
+
+
+# Foreign keys can only be turned off outside of a transaction, so the connection is held for the whole 'with'
+# block to make sure the transactions inside it run on the same connection with them turned off.
+@contextmanager
+def _foreign_keys_off():
+    with main.pool.connection() as conn:
+        enabled = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            yield
+        finally:
+            conn.execute(f"PRAGMA foreign_keys = {enabled}")
+
+
+# Changes the layout of tables, which SQLite can only do by creating the new table (named New<table>),
+# copying the rows across and putting it in place of the old one. Each table is rebuilt in its own transaction.
+# Rebuilds are given as (table, function telling whether it has been rebuilt, SQL to create the new table,
+# SQL to copy the rows into it), and tables already rebuilt (by an earlier, interrupted run) are skipped.
+# Anything that refers to the tables (such as triggers) must be dropped first and made again afterwards.
+# Foreign keys are turned off while the tables are rebuilt, as dropping the old table would otherwise
+# delete the rows pointing at it, or fail.
+def rebuild_step(*rebuilds):
+    def run(progress):
+        with _foreign_keys_off():
+            for done, (table, rebuilt, create_sql, copy_sql) in enumerate(rebuilds, start=1):
+                with transaction():
+                    if not rebuilt(table):
+                        process_sql(f"DROP TABLE IF EXISTS New{table}")
+                        process_sql(create_sql)
+                        process_sql(copy_sql)
+                        process_sql(f"DROP TABLE {table}")
+                        process_sql(f"ALTER TABLE New{table} RENAME TO {table}")
+                progress(done, len(rebuilds))
+    return run
+
+
+# Each index is built in its own transaction, so building a large index only holds up writers
+# for as long as that one index takes (in WAL mode readers aren't held up at all).
+def index_step(*statements):
+    def run(progress):
+        for done, sql in enumerate(statements, start=1):
+            with transaction():
+                process_sql(sql)
+            progress(done, len(statements))
+    return run
+
+
+# Fills in a column for existing rows in batches, each committed on its own, so the database isn't locked
+# for the whole backfill and the work already done isn't lost if it is interrupted.
+# 'update_sql' is an UPDATE statement without a WHERE clause, and 'pending' is the condition
+# that is true for rows which still need filling in (it must stop being true once a row is done).
+def backfill_step(table, update_sql, pending, batch_size=1000):
+    def run(progress):
+        total = process_sql(f"SELECT COUNT(*) FROM {table} WHERE {pending}")[0][0]
+        done = 0
+        while done < total:
+            with transaction():
+                process_sql(f"""{update_sql}
+                                WHERE rowid IN (SELECT rowid FROM {table} WHERE {pending} LIMIT ?)""",
+                            parameters=(batch_size,))
+                changed = process_sql("SELECT changes()")[0][0]
+            if not changed:
+                break
+            done += changed
+            progress(done, total)
+    return run
+
+
+# Any other change that can't be written as plain SQL, run in one transaction.
+def python_step(function):
+    def run(progress):
+        with transaction():
+            function()
+    return run
+
+
+# Makes sure every row's foreign keys point at a row that exists,
+# for after tables have been rebuilt with foreign keys turned off.
+def _check_foreign_keys():
+    problems = process_sql("PRAGMA foreign_key_check")
+    if problems:
+        raise sqlite3.IntegrityError(f"{len(problems)} rows point at rows that don't exist, "
+                                     f"the first in {problems[0][0]} (rowid {problems[0][1]})")
+
+
+def _create_admin():
+    if not process_sql("SELECT * FROM LoginTbl"):
+        pwdhash = security.hash_password('password')
+        process_sql("INSERT INTO LoginTbl VALUES (?, ?)", parameters=('admin', pwdhash))
+
+
+# Every migration in order, as (version, description, steps).
+# Migrations must never be changed once released, any further change needs a new migration.
+MIGRATIONS = [
+    (1, "Create the tables and the default admin account",
+     [sql_step(*tables.create_tables_SQL),
+      python_step(_create_admin)]),
+
+    (2, "Index the join keys and listing filters",
+     [index_step(*tables.create_indexes_SQL)]),
+
+    (3, "Keep the apartment and flat totals in summary columns",
+     [column_step(*tables.summary_columns),
+      sql_step(*tables.create_summary_triggers_SQL),
+      backfill_step("FlatApartmentTbl", tables.update_flat_summary_SQL, tables.flat_summary_pending_SQL),
+      backfill_step("ApartmentTbl", tables.update_apartment_summary_SQL, tables.apartment_summary_pending_SQL),
+      index_step(*tables.create_summary_indexes_SQL)]),
+
+    (4, "Add full text search over names, contacts and descriptions",
+     [sql_step(*tables.create_search_tables_SQL, *tables.create_search_triggers_SQL),
+      index_step(*tables.rebuild_search_SQL)]),
+
+    (5, "Join the tables on integer keys instead of the displayed IDs",
+     [sql_step(*tables.drop_triggers_SQL),
+      rebuild_step(*((table, has_column(new_column), create_sql, copy_sql)
+                     for table, (new_column, create_sql, copy_sql) in tables.keyed_tables.items())),
+      sql_step(*tables.create_summary_triggers_keyed_SQL, *tables.create_search_triggers_SQL),
+      index_step(*tables.keyed_indexes_SQL)]),
+
+    (6, "Index the IDs in number order so they can go past 9999",
+     [index_step(*tables.create_id_order_indexes_SQL)]),
+
+    (7, "Keep track of the free IDs",
+     [sql_step(tables.IDGapTbl_SQL, tables.IDReservationTbl_SQL, *tables.create_id_triggers_SQL,
+               "DELETE FROM IDGapTbl;", *tables.fill_id_gaps_SQL)]),
+
+    (8, "Index the payment amounts for number searches",
+     [index_step(*tables.create_number_search_indexes_SQL)]),
+
+    (9, "Link each payment straight to its payee",
+     [sql_step(*tables.drop_payment_search_triggers_SQL),
+      rebuild_step(("PaymentsTbl", has_column("PayeeKey"),
+                    tables.PayeePaymentsTbl_SQL, tables.copy_payee_payments_SQL)),
+      sql_step(*tables.create_payment_search_triggers_SQL, *tables.drop_payment_links_SQL),
+      index_step(*tables.payee_indexes_SQL)]),
+
+    (10, "Delete the rows that belong to a deleted row along with it",
+     [sql_step(*tables.drop_cascade_triggers_SQL),
+      rebuild_step(("FlatApartmentTbl", has_on_delete("ApartmentKey", "CASCADE"),
+                    *tables.cascade_tables["FlatApartmentTbl"]),
+                   ("TenantTbl", has_on_delete("FlatKey", "SET NULL"), *tables.cascade_tables["TenantTbl"])),
+      python_step(_check_foreign_keys),
+      sql_step(*tables.cascade_triggers_SQL, *tables.create_payee_unlink_triggers_SQL),
+      index_step(*tables.cascade_indexes_SQL)]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version():
+    return process_sql("PRAGMA user_version")[0][0]
+
+
+# This function wraps the caller's progress function so each step only has to report how far through it is.
+def _step_progress(progress, version, description):
+    def step_progress(done, total):
+        if progress is None:
+            logger.info("Migration %d (%s): %d/%d", version, description, done, total)
+        else:
+            progress(version, description, done, total)
+    return step_progress
+
+
+# This function brings the database up to the latest version, to be used on program startup.
+# 'progress' is called as progress(version, description, done, total) while the migrations run,
+# and the progress is logged instead if it isn't given.
+def migrate(progress=None):
+    current_version = get_version()
+    if current_version >= LATEST_VERSION:
+        return
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        logger.info("Migrating database from version %d to %d: %s", current_version, version, description)
+        step_progress = _step_progress(progress, version, description)
+        for step in steps:
+            step(step_progress)
+
+        with transaction():
+            process_sql(f"PRAGMA user_version = {version}")
+        current_version = version
@@ -0,0 +1,147 @@
+"""
+This file contains the keyset pagination used by the listing functions, so that only the screenful of records
+the user is looking at has to be fetched. Rather than skipping rows with OFFSET (which still has to read every row
+before the page), a page carries on from the sort key of the last row seen, followed by a column that is unique
+to each row (such as its ID) so that rows with the same sort key are never skipped or shown twice.
+The database can then jump straight to the page using the index the listing is sorted by,
+so the first page of a million payments comes back as quickly as the first page of a hundred.
+"""
+from collections import namedtuple
+
+from . import queries
+from .main import process_sql
+
+# 'records' are the rows on the page in the order they are shown. 'previous' and 'next' are the cursors to
+# pass back in to get the pages either side of it, and are None when there are no more records that way.
+Page = namedtuple("Page", ("records", "previous", "next"))
+
+PAGE_SIZE = 100
+
+DIRECTIONS = ("next", "previous")
+
+_reverse = {"ASC": "DESC", "DESC": "ASC"}
+
+# The expression is the SQL sorted by, with {} in place of the listing's column, such as "length({})".
+# The same expression is used on the cursor's value of the column. 'nullable' is whether it can be NULL.
+Key = namedtuple("Key", ("expression", "column", "direction", "nullable"))
+
+
+def key(column, direction="ASC", expression="{}", nullable=False):
+    return Key(expression, column, direction, nullable)
+
+
+# The keys that come after the cursor, as a WHERE condition. When every key is sorted the same way they
+# are compared together as a row value, which lets SQLite jump straight to the cursor in the index.
+# Otherwise each key has to be compared in turn, with the keys before it equal to the cursor. Keys that
+# can be NULL are always compared in turn, as a row value with a NULL in it is neither greater nor smaller,
+# and are compared with IS rather than '=' so that a NULL is equal to a NULL.
+def _after(keys):
+    def operator(direction):
+        return '>' if direction == "ASC" else '<'
+
+    if len({k.direction for k in keys}) == 1 and not any(k.nullable for k in keys):
+        columns = ", ".join(k.expression.format(k.column) for k in keys)
+        values = ", ".join(k.expression.format('?') for k in keys)
+        return f"({columns}) {operator(keys[0].direction)} ({values})"
+
+    conditions = []
+    for i, k in enumerate(keys):
+        equal = [f"{before.expression.format(before.column)} {'IS' if before.nullable else '='} "
+                 f"{before.expression.format('?')}" for before in keys[:i]]
+        conditions.append(" AND ".join(equal + [f"{k.expression.format(k.column)} {operator(k.direction)} "
+                                                f"{k.expression.format('?')}"]))
+    return " OR ".join(f"({condition})" for condition in conditions)
+
+
+# The keys for sorting a listing by each of 'fields', each followed by the 'tiebreak' keys (of a column that
+# is different for every row) so there is only ever one order. The columns that can be NULL are given in
+# 'nullable', and are sorted by whether they are NULL first, putting the NULLs first as ORDER BY does.
+def sorts(fields, tiebreak, nullable=()):
+    tiebreak_columns = {k.column for k in tiebreak}
+    field_sorts = {}
+    for field in fields:
+        if field in tiebreak_columns:
+            field_sorts[field] = tuple(tiebreak)
+        elif field in nullable:
+            field_sorts[field] = (key(field, expression="({} IS NOT NULL)"), key(field, nullable=True), *tiebreak)
+        else:
+            field_sorts[field] = (key(field), *tiebreak)
+    return field_sorts
+
+
+# The page option of a query, put after the listing it pages through. 'sorts' maps each way the listing
+# can be sorted to its keys, and each is given as (sort, kind), the kinds being "first" and "last"
+# (no cursor), "next" (the rows after a cursor) and "previous" (the rows before it, fetched backwards).
+def options(sorts):
+    page_options = {}
+    for sort, keys in sorts.items():
+        backwards = [k._replace(direction=_reverse[k.direction]) for k in keys]
+        order = ", ".join(f"{k.expression.format(k.column)} {k.direction}" for k in keys)
+        reverse_order = ", ".join(f"{k.expression.format(k.column)} {k.direction}" for k in backwards)
+        page_options[(sort, "first")] = f"\nORDER BY {order}"
+        page_options[(sort, "next")] = f"\nWHERE {_after(keys)}\nORDER BY {order}"
+        page_options[(sort, "last")] = f"\nORDER BY {reverse_order}"
+        page_options[(sort, "previous")] = f"\nWHERE {_after(backwards)}\nORDER BY {reverse_order}"
+    return page_options
+
+
+# The query paged through is the listing wrapped in a SELECT, with its page option and the page size after it.
+def template(listing):
+    return f"""SELECT * FROM ({listing}) AS Page{{page}}
+               LIMIT ?"""
+
+
+# A cursor is the values of the key columns of a row, in the order the columns first appear in the keys.
+def _columns(keys):
+    return tuple(dict.fromkeys(k.column for k in keys))
+
+
+def _cursor(record, keys):
+    return tuple(getattr(record, column) for column in _columns(keys))
+
+
+# The cursor's values in the order the '?'s appear in the condition made by _after()
+def _cursor_parameters(cursor, keys):
+    values = dict(zip(_columns(keys), cursor))
+    if len({k.direction for k in keys}) == 1 and not any(k.nullable for k in keys):
+        return tuple(values[k.column] for k in keys)
+    return tuple(values[k.column] for i in range(len(keys)) for k in keys[:i + 1])
+
+
+# This function gets one page of a query defined with template() and options(), 'sorts' being the same
+# dictionary given to options(). Without a cursor, "next" gets the first page and "previous" the last.
+# 'parameters' are the parameters of the listing itself, and 'choices' its other options.
+def get_page(name, sorts, sort, parameters, cursor=None, direction="next", page_size=PAGE_SIZE,
+             **choices):
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown page direction: {direction}")
+    if page_size < 1:
+        raise ValueError(f"The page size must be at least 1, not {page_size}")
+    try:
+        keys = sorts[sort]
+    except KeyError:
+        raise ValueError(f"Unknown sort for query '{name}': {sort}") from None
+
+    if cursor is None:
+        kind = "first" if direction == "next" else "last"
+        cursor_parameters = ()
+    else:
+        kind = direction
+        cursor_parameters = _cursor_parameters(cursor, keys)
+    sql = queries.get(name, page=(sort, kind), **choices)
+
+    # one row more than the page is fetched to find out whether there are any more after it
+    records = process_sql(sql, parameters=(*parameters, *cursor_parameters, page_size + 1), read_only=True)
+    more = len(records) > page_size
+    records = records[:page_size]
+    if not records:
+        return Page(records, None, None)
+
+    if direction == "previous":
+        records.reverse()
+        return Page(records,
+                    _cursor(records[0], keys) if more else None,
+                    _cursor(records[-1], keys) if cursor is not None else None)
+    return Page(records,
+                _cursor(records[0], keys) if cursor is not None else None,
+                _cursor(records[-1], keys) if more else None)
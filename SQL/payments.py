@@ -1,72 +1,153 @@
-from .main import process_sql
-
-
-# This function gets all of the payment records from the database
-# and is used to handle searching and sorting so that only the records the user wants to see are fetched.
-def get_payments(type_search, datetime_sorts, search_field, search_term):
+from . import pages, queries
+from .main import process_sql, process_many, stream_sql, transaction
+
+
+# The text and number columns the payment listing can be searched by,
+# and the columns it can be sorted by (before the date and time)
+PAYMENT_SEARCH_FIELDS = ("PaymentType", "Payee", "PaymentMethod", "PaymentDate", "PaymentTime")
+PAYMENT_NUMBER_FIELDS = ("TotalPaid",)
+PAYMENT_SORT_FIELDS = ("Payee", "PaymentMethod", "TotalPaid")
+
+# Each payment's payee is a tenant for an inbound payment and an employee for an outbound one (see SQL.tables),
+# so both are joined on and the one matching the payment type is used. Payments whose payee has been deleted
+# have no name to show, so they are left out.
+PAYEE_JOINS_SQL = """((PaymentsTbl
+                       LEFT JOIN TenantTbl
+                       ON PaymentType = 'Inbound' AND PayeeKey = TenantTbl.TenantKey)
+                       LEFT JOIN EmployeeTbl
+                       ON PaymentType = 'Outbound' AND PayeeKey = EmployeeTbl.EmployeeKey)"""
+
+PAYMENTS_SQL = f"""SELECT PaymentID, PaymentType,
+                          CASE PaymentType
+                              WHEN 'Inbound' THEN TenantTbl.TenantForename || ' ' || TenantTbl.TenantSurname
+                              WHEN 'Outbound' THEN EmployeeTbl.EmployeeForename || ' ' || EmployeeTbl.EmployeeSurname
+                          END AS Payee,
+                          PaymentMethod, CAST(TotalPaid AS REAL) AS TotalPaid, PaymentDate, PaymentTime
+                   FROM {PAYEE_JOINS_SQL}
+                   WHERE Payee IS NOT NULL"""
+
+PAYMENT_TYPES = {'*': "",
+                 'Inbound': "\n                   AND PaymentType = 'Inbound'",
+                 'Outbound': "\n                   AND PaymentType = 'Outbound'"}
+
+
+# The body of the query depends on both the payment type shown and the column searched
+def _payment_bodies():
+    searches = {**queries.searches(PAYMENT_SEARCH_FIELDS, "AND"),
+                **queries.number_searches(PAYMENT_NUMBER_FIELDS, "AND")}
+    return {(type_search, search_field): PAYMENTS_SQL + type_filter + search
+            for type_search, type_filter in PAYMENT_TYPES.items() for search_field, search in searches.items()}
+
+
+# Sorting by a column is given as (field, direction), and the payments are still sorted by date and time after it.
+# Sorting by no column is given by None.
+def _column_sorts():
+    sorts = {None: ""}
+    sorts.update({(field, direction): f"{field} {direction}, "
+                  for field in PAYMENT_SORT_FIELDS for direction in queries.directions()})
+    return sorts
+
+
+queries.define("payments", """{payments}
+                  ORDER BY {sort}PaymentDate {date},
+                           PaymentTime {time}""",
+               payments=_payment_bodies(),
+               sort=_column_sorts(),
+               date=queries.directions(),
+               time=queries.directions())
+
+
+# The keys each sort of the payment listing is paged by (see SQL.pages), keyed by (column sort, date direction,
+# time direction). The payments made at the same time are kept in the order they were added.
+def _page_sorts():
+    sorts = {}
+    for column_sort in _column_sorts():
+        column_keys = (pages.key(*column_sort),) if column_sort else ()
+        for date in queries.directions():
+            for time in queries.directions():
+                sorts[(column_sort, date, time)] = (*column_keys, pages.key("PaymentDate", date),
+                                                    pages.key("PaymentTime", time), pages.key("PaymentID", time))
+    return sorts
+
+
+PAYMENT_PAGE_SORTS = _page_sorts()
+
+queries.define("payments_page", pages.template("{payments}"),
+               payments=_payment_bodies(),
+               page=pages.options(PAYMENT_PAGE_SORTS))
+
+
+def _search(type_search, search_field, search_term):
     parameters = ()
-    search = ''
     # if there is a search term, add the search to the query
     if search_term not in ('*', ''):
-        search = f'AND {search_field} LIKE ? COLLATE NOCASE'
-        if type_search not in ('Inbound', 'Outbound'):
-            parameters = (f"{search_term}%", f"{search_term}%")
+        if search_field in PAYMENT_NUMBER_FIELDS:
+            operator, parameters = queries.parse_number_search(search_term)
+            search_field = (search_field, operator)
         else:
             parameters = (f"{search_term}%",)
-
-    sql_inbounds = f"""SELECT PaymentsTbl.PaymentID, PaymentType, 
-                             (TenantTbl.TenantForename || ' ' || TenantTbl.TenantSurname) AS Payee,
-                              PaymentMethod, CAST(TotalPaid AS REAL), PaymentDate, PaymentTime
-                       FROM ((PaymentsTbl INNER JOIN FlatPaymentsTbl
-                              ON PaymentsTbl.PaymentID = FlatPaymentsTbl.PaymentID)
-                              INNER JOIN TenantTbl
-                              ON FlatPaymentsTbl.TenantID = TenantTbl.TenantID)
-                       WHERE PaymentsTbl.PaymentType = 'Inbound' {search}"""
-
-    sql_outbounds = f"""SELECT PaymentsTbl.PaymentID, PaymentType, 
-                              (EmployeeTbl.EmployeeForename || ' ' || EmployeeTbl.EmployeeSurname) AS Payee, 
-                               PaymentMethod, CAST(TotalPaid AS REAL), PaymentDate, PaymentTime
-                        FROM ((PaymentsTbl INNER JOIN EmployeePaymentsTbl
-                               ON PaymentsTbl.PaymentID = EmployeePaymentsTbl.PaymentID)
-                               INNER JOIN EmployeeTbl
-                               ON EmployeePaymentsTbl.EmployeeID = EmployeeTbl.EmployeeID)
-                        WHERE PaymentsTbl.PaymentType = 'Outbound' {search}"""
-
-    if type_search == 'Inbound':
-        sql = sql_inbounds
-    elif type_search == 'Outbound':
-        sql = sql_outbounds
-    else:
-        sql = f"""{sql_inbounds} 
-                  UNION ALL 
-                  {sql_outbounds}"""
-
-    sql += f"""\nORDER BY PaymentDate {datetime_sorts['Date']},
-                          PaymentTime {datetime_sorts['Time']}"""
-    return process_sql(sql, parameters=parameters)
-
-
-def get_payment(payment_id, payment_type):
-    if payment_type == "Inbound":
-        sql = f"""SELECT (TenantTbl.TenantID || ' ' ||
-                          TenantTbl.TenantForename || ' ' || TenantTbl.TenantSurname) AS Payee,
-                          PaymentMethod, TotalPaid, PaymentDate, PaymentTime, PaymentDescription
-                  FROM ((PaymentsTbl INNER JOIN FlatPaymentsTbl
-                         ON PaymentsTbl.PaymentID = FlatPaymentsTbl.PaymentID)
-                         INNER JOIN TenantTbl
-                         ON FlatPaymentsTbl.TenantID = TenantTbl.TenantID)
-                  WHERE PaymentsTbl.PaymentID = ?"""
     else:
-        sql = f"""SELECT (EmployeeTbl.EmployeeID || ' ' || 
-                          EmployeeTbl.EmployeeForename || ' ' || EmployeeTbl.EmployeeSurname) AS Payee, 
-                          PaymentMethod, TotalPaid, PaymentDate, PaymentTime, PaymentDescription
-                  FROM ((PaymentsTbl INNER JOIN EmployeePaymentsTbl
-                         ON PaymentsTbl.PaymentID = EmployeePaymentsTbl.PaymentID)
-                         INNER JOIN EmployeeTbl
-                         ON EmployeePaymentsTbl.EmployeeID = EmployeeTbl.EmployeeID)
-                  WHERE PaymentsTbl.PaymentID = ?"""
+        search_field = None
 
-    return process_sql(sql, parameters=(payment_id,))
+    if type_search not in PAYMENT_TYPES:
+        type_search = '*'
+    return (type_search, search_field), parameters
+
+
+# This function gets all of the payment records from the database
+# and is used to handle searching and sorting so that only the records the user wants to see are fetched.
+# If 'stream' is True the records are returned as an iterator which fetches them in batches.
+# 'column_sort' is a (field, direction) pair from PAYMENT_SORT_FIELDS to sort by before the date and time.
+def get_payments(type_search, datetime_sorts, search_field, search_term, stream=False, column_sort=None):
+    payments, parameters = _search(type_search, search_field, search_term)
+    sql = queries.get("payments", payments=payments, sort=column_sort,
+                      date=datetime_sorts['Date'], time=datetime_sorts['Time'])
+
+    if stream:
+        return stream_sql(sql, parameters=parameters)
+    return process_sql(sql, parameters=parameters, read_only=True)
+
+
+# This function gets one page of the payment listing as a SQL.pages.Page, carrying on from
+# the cursor of the page before it (or after it, if 'direction' is "previous").
+def get_payments_page(type_search, datetime_sorts, search_field, search_term, column_sort=None, cursor=None,
+                      direction="next", page_size=pages.PAGE_SIZE):
+    payments, parameters = _search(type_search, search_field, search_term)
+    sort = (column_sort, datetime_sorts['Date'], datetime_sorts['Time'])
+    return pages.get_page("payments_page", PAYMENT_PAGE_SORTS, sort, parameters, cursor, direction, page_size,
+                          payments=payments)
+
+
+def get_payment(payment_id):
+    sql = f"""SELECT CASE PaymentType
+                         WHEN 'Inbound' THEN TenantTbl.TenantID || ' ' ||
+                                             TenantTbl.TenantForename || ' ' || TenantTbl.TenantSurname
+                         WHEN 'Outbound' THEN EmployeeTbl.EmployeeID || ' ' ||
+                                              EmployeeTbl.EmployeeForename || ' ' || EmployeeTbl.EmployeeSurname
+                     END AS Payee,
+                     PaymentMethod, TotalPaid, PaymentDate, PaymentTime, PaymentDescription
+              FROM {PAYEE_JOINS_SQL}
+              WHERE PaymentID = ? AND Payee IS NOT NULL"""
+
+    return process_sql(sql, parameters=(payment_id,), read_only=True)
+
+
+# This function gets many payments at once as a dictionary keyed by payment ID,
+# leaving out the IDs that aren't in the database.
+def get_payments_by_ids(payment_ids):
+    sql = f"""SELECT PaymentID, PaymentType,
+                     CASE PaymentType
+                         WHEN 'Inbound' THEN TenantTbl.TenantID || ' ' ||
+                                             TenantTbl.TenantForename || ' ' || TenantTbl.TenantSurname
+                         WHEN 'Outbound' THEN EmployeeTbl.EmployeeID || ' ' ||
+                                              EmployeeTbl.EmployeeForename || ' ' || EmployeeTbl.EmployeeSurname
+                     END AS Payee,
+                     PaymentMethod, TotalPaid, PaymentDate, PaymentTime, PaymentDescription
+              FROM {PAYEE_JOINS_SQL}
+              WHERE PaymentID {queries.IN_LIST} AND Payee IS NOT NULL"""
+
+    records = process_sql(sql, parameters=(queries.json_list(payment_ids),), read_only=True)
+    return {record.PaymentID: record for record in records}
 
 
 def get_payees(payment_type):
@@ -75,52 +156,61 @@ def get_payees(payment_type):
     else:
         sql = "SELECT EmployeeID, EmployeeForename, EmployeeSurname FROM EmployeeTbl"
 
-    return process_sql(sql)
+    return process_sql(sql, read_only=True)
+
+
+# The key of a payment's payee, from its payment type (the SQL given by 'payment_type')
+# and the ID of the tenant or employee, which is given as the two parameters after it.
+def _payee_key(payment_type):
+    return f"""CASE {payment_type}
+                   WHEN 'Outbound' THEN (SELECT EmployeeKey FROM EmployeeTbl WHERE EmployeeID = ?)
+                   ELSE (SELECT TenantKey FROM TenantTbl WHERE TenantID = ?)
+               END"""
+
 
+ADD_PAYMENT_SQL = f"""INSERT INTO PaymentsTbl(PaymentType, PaymentMethod, TotalPaid, 
+                                              PaymentDate, PaymentTime, PaymentDescription, PayeeKey)
+                      VALUES (?, ?, ?, ?, ?, ?, {_payee_key('?')})"""
 
+
+# The payment type is given again for working out the payee key
+def _add_parameters(record, payee_id):
+    return (*record, record[0], payee_id, payee_id)
+
+
+# The payment is added by one statement which hands back its new ID, so the ID can't belong to a payment
+# added by someone else in the meantime (as last_insert_rowid() could), and there is only one commit.
 def add_payment(record, payee_id):
-    sql = """INSERT INTO PaymentsTbl(PaymentType, PaymentMethod, TotalPaid, 
-                                     PaymentDate, PaymentTime, PaymentDescription)
-             VALUES (?, ?, ?, ?, ?, ?)"""
-    process_sql(sql, parameters=record)
-
-    if record[0] == "Outbound":
-        sql = """INSERT INTO EmployeePaymentsTbl(PaymentID, EmployeeID) 
-                 VALUES (last_insert_rowid(), ?)"""
-    else:
-        sql = """INSERT INTO FlatPaymentsTbl(PaymentID, TenantID)
-                 VALUES (last_insert_rowid(), ?)"""
-    process_sql(sql, parameters=(payee_id,))
-
-
-def edit_payment(payment_id, payment_type, record, payee_id):
-    sql = """UPDATE PaymentsTbl SET
-             PaymentMethod = ?,
-             TotalPaid = ?,
-             PaymentDate = ?,
-             PaymentTime = ?,
-             PaymentDescription = ?
-             WHERE PaymentID = ?"""
-    process_sql(sql, parameters=(*record, payment_id))
-
-    if payment_type == "Inbound":
-        sql = """UPDATE FlatPaymentsTbl SET
-                 TenantID = ?
-                 WHERE PaymentID = ?"""
-    else:
-        sql = """UPDATE EmployeePaymentsTbl SET
-                 EmployeeID = ?
-                 WHERE PaymentID = ?"""
-    process_sql(sql, parameters=(payee_id, payment_id,))
+    sql = f"""{ADD_PAYMENT_SQL}
+              RETURNING PaymentID"""
+    return process_sql(sql, parameters=_add_parameters(record, payee_id))[0][0]
 
 
-# This function deletes the payments from both the link tables and the payment table
-def delete_payment(payment_id, payment_type):
-    sql = "DELETE FROM PaymentsTbl WHERE PaymentID = ?"
-    process_sql(sql, parameters=(payment_id,))
+# This function adds many payments at once in a single transaction, where 'payments' is
+# an iterable of (record, payee_id) pairs as given to add_payment. Returns the new payment IDs
+# in the same order as the payments given.
+def add_payments(payments):
+    payments = list(payments)
+    with transaction():
+        process_many(ADD_PAYMENT_SQL, (_add_parameters(record, payee_id) for record, payee_id in payments))
 
-    if payment_type == "Inbound":
-        sql = "DELETE FROM FlatPaymentsTbl WHERE PaymentID = ?"
-    else:
-        sql = "DELETE FROM EmployeePaymentsTbl WHERE PaymentID = ?"
+        # The write lock is held for the whole transaction, so the new IDs are the ones leading up to the last one
+        last_id = process_sql("SELECT last_insert_rowid()")[0][0]
+    return list(range(last_id - len(payments) + 1, last_id + 1))
+
+
+def edit_payment(payment_id, record, payee_id):
+    sql = f"""UPDATE PaymentsTbl SET
+              PaymentMethod = ?,
+              TotalPaid = ?,
+              PaymentDate = ?,
+              PaymentTime = ?,
+              PaymentDescription = ?,
+              PayeeKey = {_payee_key('PaymentType')}
+              WHERE PaymentID = ?"""
+    process_sql(sql, parameters=(*record, payee_id, payee_id, payment_id))
+
+
+def delete_payment(payment_id):
+    sql = "DELETE FROM PaymentsTbl WHERE PaymentID = ?"
     process_sql(sql, parameters=(payment_id,))
@@ -0,0 +1,151 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+# A fixed size pool of connections to the database which can be shared between threads.
+# Each thread checks out its own connection, and asking for a connection again on the same thread
+# hands back the one it already holds, so helpers that call each other only ever use one connection.
+class ConnectionPool:
+    # Connections left idle for longer than this many seconds are checked before they are handed out again
+    IDLE_CHECK_AFTER = 60.0
+
+    def __init__(self, db_filename, size=4, timeout=30.0, setup_sql=(), cached_statements=128, uri=False,
+                 row_factory=None):
+        self.db_filename = db_filename
+        self.uri = uri  # whether db_filename is a 'file:' URI, used for opening connections read-only
+        self.row_factory = row_factory  # what type each row is returned as, plain tuples if None
+        self.size = size
+        # How long to wait for a free connection. It is also how long a new connection waits for a locked database,
+        # until the setup_sql sets a busy_timeout of its own (as every profile in SQL.profiles does).
+        self.timeout = timeout
+        self.setup_sql = setup_sql  # statements run on every new connection, such as PRAGMAs
+        self.cached_statements = cached_statements  # how many prepared statements each connection keeps
+
+        # most recently used connections are handed out first, each as (connection, time released, suspect)
+        self._idle = queue.LifoQueue()
+        self._connections = set()
+        self._opening = 0  # connections being opened, which already count towards the size
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    # Opens a new connection. check_same_thread is turned off because a connection
+    # is handed to whichever thread checks it out next, but only ever one thread at a time.
+    # isolation_level=None leaves transactions to SQL.main.transaction rather than the sqlite3 module.
+    def _connect(self):
+        conn = sqlite3.connect(self.db_filename, timeout=self.timeout, check_same_thread=False,
+                               isolation_level=None, cached_statements=self.cached_statements, uri=self.uri)
+        try:
+            conn.row_factory = self.row_factory
+            for sql in self.setup_sql:
+                conn.execute(sql)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    # Opens a new connection if the pool isn't full, returning None if it is. The slot is taken before
+    # connecting (which happens outside the lock), so threads asking at the same time can't go over the size.
+    def _try_connect(self):
+        with self._lock:
+            if len(self._connections) + self._opening >= self.size:
+                return None
+            self._opening += 1
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+            raise
+        with self._lock:
+            self._opening -= 1
+            self._connections.add(conn)
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    # A quick query to make sure a connection is still usable before it is handed out. Only connections
+    # that were idle for a while or whose last use raised an error are checked, to keep checkouts cheap.
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot use a closed connection pool.")
+
+        try:
+            conn, released, suspect = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._try_connect()
+            if conn is not None:
+                return conn
+
+            try:
+                conn, released, suspect = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError("Timed out waiting for a free database connection.") from None
+
+        # Broken connections are replaced rather than handed back to the caller
+        check = suspect or time.monotonic() - released > self.IDLE_CHECK_AFTER
+        if check and not self._is_healthy(conn):
+            self._discard(conn)
+            return self._try_connect() or self._acquire()
+        return conn
+
+    def _release(self, conn, suspect=False):
+        if self._closed:
+            self._discard(conn)
+            return
+
+        # A connection must never be handed on with a half finished transaction still open
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                suspect = True
+        self._idle.put((conn, time.monotonic(), suspect))
+
+    # Checks out a connection for the current thread for the duration of the 'with' block.
+    @contextmanager
+    def connection(self):
+        local = self._local
+        if getattr(local, 'conn', None) is None:
+            local.conn = self._acquire()
+            local.depth = 0
+            local.suspect = False  # whether an error was raised while it was checked out
+
+        local.depth += 1
+        try:
+            yield local.conn
+        except sqlite3.Error:
+            local.suspect = True
+            raise
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                conn, local.conn = local.conn, None
+                self._release(conn, local.suspect)
+
+    # Closes every idle connection. Connections still checked out are closed as soon as they are released.
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
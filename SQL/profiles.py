@@ -0,0 +1,56 @@
+"""
+This file contains the named performance profiles the database can be opened with.
+Each profile is a set of PRAGMA statements that are run on every new connection,
+so the trade off between speed and durability can be chosen without changing any other code.
+"""
+
+# The order of each profile matters, busy_timeout is set first so that
+# switching the journal mode waits for other connections instead of failing straight away.
+# Every profile turns foreign keys on, as the tables rely on them to delete (or unlink)
+# the rows belonging to a row that is deleted (see SQL.tables).
+PROFILES = {
+    # Every commit is fully synced to disk before returning, for when losing the last transaction is unacceptable.
+    "durable": {"busy_timeout": 5000,
+                "journal_mode": "WAL",
+                "synchronous": "FULL",
+                "cache_size": -16000,       # negative sizes are in KiB, so this is roughly 16MB
+                "mmap_size": 0,
+                "temp_store": "DEFAULT",
+                "foreign_keys": "ON"},
+
+    # WAL with synchronous=NORMAL can only lose the last commits on a power cut, never corrupt the database.
+    "balanced": {"busy_timeout": 5000,
+                 "journal_mode": "WAL",
+                 "synchronous": "NORMAL",
+                 "cache_size": -64000,
+                 "mmap_size": 268435456,    # 256MB
+                 "temp_store": "MEMORY",
+                 "foreign_keys": "ON"},
+
+    # For importing large amounts of data, where the import can simply be re-run if the machine crashes.
+    "bulk-load": {"busy_timeout": 30000,
+                  "journal_mode": "WAL",
+                  "synchronous": "OFF",
+                  "cache_size": -256000,
+                  "mmap_size": 1073741824,  # 1GB
+                  "temp_store": "MEMORY",
+                  "foreign_keys": "ON"},
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+# This function gets the PRAGMA statements for a profile, raising a ValueError for unknown profile names.
+# Read-only connections can't change the journal mode (it is stored in the database file by the writer),
+# and are set to query_only so that a write sent to them by mistake fails instead of taking a lock.
+def get_pragmas(profile, read_only=False):
+    try:
+        pragmas = PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown database profile '{profile}', "
+                         f"expected one of: {', '.join(PROFILES)}") from None
+
+    if read_only:
+        pragmas = {name: value for name, value in pragmas.items() if name != "journal_mode"}
+        pragmas["query_only"] = "ON"
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
@@ -0,0 +1,122 @@
+"""
+This file contains the registry of named queries used by the listing functions in the SQL folder.
+Every variant of a query (each sort column, search column, sort direction etc.) is built from a fixed set
+of allowed columns the first time it is asked for, and kept. The listing functions look the finished SQL
+up by name, so the same request always runs the exact same statement text (letting sqlite3 reuse the
+prepared statement), and a column name that isn't allowed can never reach the SQL.
+"""
+import json
+import math
+
+# key is (query name, chosen options), value is the finished SQL
+registry = {}
+
+# key is the query name, value is (template, options) as given to define()
+_definitions = {}
+
+
+# Registers a query. The template contains a {placeholder} for each option,
+# and each option is a dictionary mapping the values a caller can ask for to the SQL put in its place.
+def define(name, template, **options):
+    _definitions[name] = (template, options)
+
+
+# This function gets the SQL for one variant of a query, building it the first time,
+# raising a ValueError if any of the options asked for were not registered.
+def get(name, **choices):
+    try:
+        template, options = _definitions[name]
+        key = tuple(choices[option_name] for option_name in options)
+        sql = registry.get((name, key))
+        if sql is None:
+            snippets = {option_name: option[choice] for (option_name, option), choice in zip(options.items(), key)}
+            sql = registry[(name, key)] = template.format(**snippets)
+        return sql
+    except KeyError:
+        raise ValueError(f"Unknown variant of query '{name}': {choices}") from None
+
+
+# The number of variants of every registered query, whether they have been built yet or not.
+def count():
+    return sum(math.prod(len(option) for option in options.values()) for _, options in _definitions.values())
+
+
+# These helpers build the most common options, mapping each allowed column to a piece of SQL.
+def columns(fields):
+    return {field: field for field in fields}
+
+
+# IDs such as T0001 are a letter followed by at least 4 digits (T9999 is followed by T10000), so sorting them
+# by their length first keeps them in number order, rather than putting T10000 between T1000 and T1001.
+def id_order(field):
+    return f"length({field}), {field}"
+
+
+def directions():
+    return {"ASC": "ASC", "DESC": "DESC"}
+
+
+# 'clause' is the start of the SQL, such as "WHERE" or "AND". Searching on no column is given by None.
+def searches(fields, clause, pattern="{field} LIKE ? COLLATE NOCASE"):
+    options = {None: ""}
+    options.update({field: f"\n{clause} {pattern.format(field=field)}" for field in fields})
+    return options
+
+
+# The ways a number column can be searched, as the SQL for each with {field} in place of the column.
+# A plain number finds the values starting with it as they are shown (to 2 decimal places), so "3" finds 3 and 300.
+# The comparisons can use an index on the column, unlike the plain search.
+NUMBER_OPERATORS = {"prefix": "printf('%.2f', {field}) LIKE ? ESCAPE '\\'",
+                    ">": "{field} > ?",
+                    ">=": "{field} >= ?",
+                    "<": "{field} < ?",
+                    "<=": "{field} <= ?",
+                    "..": "{field} BETWEEN ? AND ?"}
+
+
+# The number searches for each field are keyed by (field, operator), as returned by parse_number_search.
+def number_searches(fields, clause):
+    return {(field, operator): f"\n{clause} {pattern.format(field=field)}"
+            for field in fields for operator, pattern in NUMBER_OPERATORS.items()}
+
+
+# Escapes the characters LIKE treats specially so they are searched for as they are typed,
+# and adds the wildcard that finds everything starting with the term.
+def like_prefix(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# Looking up many rows at once, the values are passed in as one JSON list rather than a '?' each,
+# so any number of them can be looked up with the same statement (and without reaching SQLite's limit
+# on the number of parameters). IN_LIST checks a column against the list, using the column's index.
+IN_LIST = "IN (SELECT value FROM json_each(?))"
+
+
+def json_list(values):
+    return json.dumps(list(values))
+
+
+def _to_number(text):
+    return float(text.strip().lstrip('£').replace(',', ''))
+
+
+# This function turns a number search typed by the user into one of NUMBER_OPERATORS and its parameters:
+#   ">500", ">=500", "<500", "<=500"  compare against the number
+#   "200..400"                        finds the numbers between the two, inclusive
+#   "=500"                            finds the values shown as exactly £500.00
+# Anything else is searched for as the start of the number.
+def parse_number_search(term):
+    term = term.strip()
+    try:
+        if '..' in term:
+            low, high = sorted(_to_number(number) for number in term.split('..', 1))
+            return "..", (low, high)
+        if term.startswith('='):
+            number = _to_number(term[1:])
+            return "..", (number - 0.005, number + 0.005)
+        for operator in (">=", "<=", ">", "<"):
+            if term.startswith(operator):
+                return operator, (_to_number(term[len(operator):]),)
+    except ValueError:
+        pass
+    return "prefix", (like_prefix(term.lstrip('£')),)
@@ -0,0 +1,72 @@
+"""
+This file contains the record types that rows from the database are returned as.
+They are named tuples, so they can still be indexed and unpacked like the plain tuples sqlite3 returns,
+but the values can also be read by column name (record.Payee instead of record[0]).
+Named tuples don't carry a __dict__ per row, so they take up the same memory as a plain tuple
+and far less than a dictionary per row would.
+"""
+from collections import namedtuple
+
+# Apartments
+ApartmentRow = namedtuple("ApartmentRow", ("ApartmentID", "NumFlats", "NumTenants", "Upkeep",
+                                           "ApartmentAddress", "ApartmentPostcode"))
+ApartmentDetailRow = namedtuple("ApartmentDetailRow", ("NumFlats", "NumTenants", "Upkeep",
+                                                       "ApartmentAddress", "ApartmentPostcode",
+                                                       "ApartmentDescription"))
+
+# Flats
+FlatRow = namedtuple("FlatRow", ("FlatNumber", "NumTenants", "Tenants", "WeeklyRent"))
+
+# Employees
+EmployeeRow = namedtuple("EmployeeRow", ("EmployeeID", "EmployeeForename", "EmployeeSurname",
+                                         "EmployeeContact", "EmployeeAddress", "EmployeePostcode"))
+EmployeeDetailRow = namedtuple("EmployeeDetailRow", ("EmployeeForename", "EmployeeSurname", "EmployeeContact",
+                                                     "EmployeeAddress", "EmployeePostcode",
+                                                     "EmployeeDescription"))
+
+# Tenants
+TenantRow = namedtuple("TenantRow", ("TenantID", "TenantForename", "TenantSurname", "TenantContact",
+                                     "ApartmentAddress", "FlatNumber", "ApartmentPostcode"))
+TenantDetailRow = namedtuple("TenantDetailRow", ("TenantForename", "TenantSurname", "TenantContact",
+                                                 "ApartmentAddress", "FlatNumber", "TenantDescription"))
+
+# Payments
+PaymentRow = namedtuple("PaymentRow", ("PaymentID", "PaymentType", "Payee", "PaymentMethod",
+                                       "TotalPaid", "PaymentDate", "PaymentTime"))
+PaymentDetailRow = namedtuple("PaymentDetailRow", ("Payee", "PaymentMethod", "TotalPaid",
+                                                   "PaymentDate", "PaymentTime", "PaymentDescription"))
+
+# key is the column names returned by a query, value is the record type used for its rows.
+# Queries that don't match one of the types above get a generic type made for their columns the first time.
+_record_types = {record_type._fields: record_type
+                 for record_type in (ApartmentRow, ApartmentDetailRow, FlatRow,
+                                     EmployeeRow, EmployeeDetailRow,
+                                     TenantRow, TenantDetailRow,
+                                     PaymentRow, PaymentDetailRow)}
+
+
+# The description of the last statement rows were made for, and the record type for it. The description
+# is the same object for every row of a statement, so the record type is only looked up once per statement.
+# The description is kept alive by holding it here, so another statement's can never be mistaken for it,
+# and threads using it at the same time can only cause an extra lookup.
+_last_statement = (None, None)
+
+
+def _record_type(description):
+    columns = tuple(column[0] for column in description)
+    record_type = _record_types.get(columns)
+    if record_type is None:
+        # rename=True replaces column names that aren't valid attribute names, such as COUNT(*), with _0, _1...
+        record_type = _record_types[columns] = namedtuple("Record", columns, rename=True)
+    return record_type
+
+
+# This function is used as the row_factory of every connection, to turn each row into a record.
+def row_factory(cursor, row):
+    global _last_statement
+    description, record_type = _last_statement
+    if cursor.description is not description:
+        description = cursor.description
+        record_type = _record_type(description)
+        _last_statement = (description, record_type)
+    return tuple.__new__(record_type, row)
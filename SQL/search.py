@@ -0,0 +1,50 @@
+"""
+This file contains the full text search, which finds tenants, employees, apartments and payments
+by any of the words in them (including their descriptions) using the search tables made in SQL.tables.
+The results are IDs in order of how well they match, best first, which can then be used to get the records.
+"""
+from . import queries
+from .main import process_sql
+
+# key is what can be searched, value is (search table, table it indexes, rowid column of that table, ID column)
+SEARCHES = {"tenants": ("TenantSearchTbl", "TenantTbl", "rowid", "TenantID"),
+            "employees": ("EmployeeSearchTbl", "EmployeeTbl", "rowid", "EmployeeID"),
+            "apartments": ("ApartmentSearchTbl", "ApartmentTbl", "rowid", "ApartmentID"),
+            "payments": ("PaymentSearchTbl", "PaymentsTbl", "PaymentID", "PaymentID")}
+
+# 'rank' orders the matches by how relevant they are (using the bm25 algorithm), best first.
+for kind, (search_table, table, rowid, id_column) in SEARCHES.items():
+    queries.define(f"search_{kind}", f"""SELECT {table}.{id_column}
+                                         FROM {search_table} INNER JOIN {table}
+                                         ON {table}.{rowid} = {search_table}.rowid
+                                         WHERE {search_table} MATCH ?
+                                         ORDER BY {search_table}.rank
+                                         LIMIT ?""")
+
+
+# This function turns what the user typed into a search, where every word must be found
+# but may be the start of a longer word, so "boil lea" finds "boiler leak".
+# Each word is quoted so that characters with a meaning to the search (such as - or ") are searched for as text.
+def make_search_expression(text):
+    words = text.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+# This function gets the IDs of the records matching the search, best match first.
+# 'kind' is one of the keys of SEARCHES, for example search("payments", "boiler leak")
+def search(kind, text, limit=100):
+    if kind not in SEARCHES:
+        raise ValueError(f"Unknown search '{kind}', expected one of {', '.join(SEARCHES)}")
+
+    expression = make_search_expression(text)
+    if not expression:
+        return []
+
+    sql = queries.get(f"search_{kind}")
+    return [record[0] for record in process_sql(sql, parameters=(expression, limit), read_only=True)]
+
+
+# This function searches everything at once, returning a dictionary of
+# key is what was searched (as in SEARCHES), value is the IDs found, best match first.
+def search_all(text, limit=100):
+    return {kind: search(kind, text, limit=limit) for kind in SEARCHES}
@@ -0,0 +1,92 @@
+"""
+This file keeps timing statistics for every query run through SQL.main, so that the slow queries can be found.
+Queries are grouped by their normalised SQL text, and any query slower than the threshold
+is written to the log alongside its query plan.
+"""
+import re
+import logging
+import functools
+import threading
+
+# The upper bound (in milliseconds) of each bucket in the timing histograms
+BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, float('inf'))
+
+logger = logging.getLogger(__name__)
+
+# Queries taking longer than this many seconds are written to the slow query log
+slow_query_threshold = 0.1
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def set_slow_query_threshold(seconds):
+    global slow_query_threshold
+    slow_query_threshold = seconds
+
+
+# This function removes the formatting and literal values from a query,
+# so that the same query run with different values is counted together.
+# The queries are almost all from a fixed set (see SQL.queries), so each is only normalised once.
+@functools.lru_cache(maxsize=1024)
+def normalise_sql(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return ' '.join(sql.split())
+
+
+# This function records a single run of a query. 'explain' is only called for slow queries,
+# and should return the rows of the EXPLAIN QUERY PLAN output for the query.
+def record(sql, num_parameters, elapsed, num_rows, explain=None):
+    normalised_sql = normalise_sql(sql)
+    elapsed_ms = elapsed * 1000
+    bucket = next(i for i, bound in enumerate(BUCKETS) if elapsed_ms <= bound)
+
+    with _lock:
+        stats = _stats.get(normalised_sql)
+        if stats is None:
+            stats = _stats[normalised_sql] = {"sql": normalised_sql,
+                                              "parameters": num_parameters,
+                                              "calls": 0,
+                                              "rows": 0,
+                                              "total_ms": 0.0,
+                                              "max_ms": 0.0,
+                                              "histogram": [0] * len(BUCKETS)}
+        stats["calls"] += 1
+        stats["rows"] += max(num_rows, 0)
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["histogram"][bucket] += 1
+
+    if elapsed > slow_query_threshold:
+        plan = explain() if explain is not None else []
+        plan = '\n'.join(f"    {row[-1]}" for row in plan) or "    (no plan available)"
+        logger.warning("Slow query took %.1fms and returned %d rows:\n  %s\n  Query plan:\n%s",
+                       elapsed_ms, num_rows, normalised_sql, plan)
+
+
+# This function gets the statistics for every query run so far, slowest in total first.
+def get_stats():
+    with _lock:
+        stats = [dict(query, histogram=list(query["histogram"])) for query in _stats.values()]
+
+    for query in stats:
+        query["mean_ms"] = query["total_ms"] / query["calls"]
+    return sorted(stats, key=lambda query: query["total_ms"], reverse=True)
+
+
+# This function formats the statistics as a table, for writing to the log or a file.
+def dump_stats(limit=None):
+    headers = ' '.join(f"{'<=' + str(bound) if bound != float('inf') else '>' + str(BUCKETS[-2]):>7}"
+                       for bound in BUCKETS)
+    lines = [f"{'calls':>7} {'rows':>9} {'total ms':>10} {'mean ms':>9} {'max ms':>9}  {headers}  query"]
+    for query in get_stats()[:limit]:
+        histogram = ' '.join(f"{count:>7}" for count in query["histogram"])
+        lines.append(f"{query['calls']:>7} {query['rows']:>9} {query['total_ms']:>10.1f} "
+                     f"{query['mean_ms']:>9.2f} {query['max_ms']:>9.2f}  {histogram}  {query['sql']}")
+    return '\n'.join(lines)
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
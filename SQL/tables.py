@@ -92,3 +92,580 @@ create_tables_SQL = [LoginTbl_SQL,
                      EmployeeTbl_SQL,
                      EmployeePaymentsTbl_SQL, PaymentsTbl_SQL, FlatPaymentsTbl_SQL,
                      TenantTbl_SQL, FlatApartmentTbl_SQL, ApartmentTbl_SQL]
+
+
+# Indexes on the foreign keys used by the joins, and on the columns the listings filter and sort by.
+# The primary keys are already indexed by SQLite.
+# The NOCASE indexes let the "LIKE 'term%' COLLATE NOCASE" searches look up the matching rows directly.
+create_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS TenantFlatIdx ON TenantTbl(FlatID);",
+    "CREATE INDEX IF NOT EXISTS TenantForenameIdx ON TenantTbl(TenantForename COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS TenantSurnameIdx ON TenantTbl(TenantSurname COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS EmployeeForenameIdx ON EmployeeTbl(EmployeeForename COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS EmployeeSurnameIdx ON EmployeeTbl(EmployeeSurname COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS FlatApartmentIdx ON FlatApartmentTbl(ApartmentID, FlatNumber);",
+    "CREATE INDEX IF NOT EXISTS ApartmentAddressIdx ON ApartmentTbl(ApartmentAddress);",
+    "CREATE INDEX IF NOT EXISTS FlatPaymentsTenantIdx ON FlatPaymentsTbl(TenantID);",
+    "CREATE INDEX IF NOT EXISTS EmployeePaymentsEmployeeIdx ON EmployeePaymentsTbl(EmployeeID);",
+    "CREATE INDEX IF NOT EXISTS PaymentTypeDateTimeIdx ON PaymentsTbl(PaymentType, PaymentDate, PaymentTime);",
+]
+
+
+# The totals shown in the apartment and flat listings are kept in summary columns instead of being counted
+# on every listing. They were added after the tables above were first created, so they are added by a migration.
+summary_columns = [("FlatApartmentTbl", "NumTenants INTEGER NOT NULL DEFAULT 0"),
+                   ("ApartmentTbl", "NumFlats INTEGER NOT NULL DEFAULT 0"),
+                   ("ApartmentTbl", "NumTenants INTEGER NOT NULL DEFAULT 0"),
+                   ("ApartmentTbl", "Upkeep REAL NOT NULL DEFAULT 0.0")]
+
+# Each summary column is recounted from the rows it sums up, using the FlatID and ApartmentID indexes,
+# so only the tenants of one flat or the flats of one apartment are read each time.
+update_flat_summary_SQL = """
+UPDATE FlatApartmentTbl SET
+        NumTenants = (SELECT COUNT(*) FROM TenantTbl WHERE TenantTbl.FlatID = FlatApartmentTbl.FlatID)"""
+
+update_apartment_summary_SQL = """
+UPDATE ApartmentTbl SET
+        NumFlats = (SELECT COUNT(*) FROM FlatApartmentTbl AS Flat
+                    WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID),
+        NumTenants = (SELECT COALESCE(SUM(Flat.NumTenants), 0) FROM FlatApartmentTbl AS Flat
+                      WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID),
+        Upkeep = (SELECT COALESCE(SUM(Flat.WeeklyRent), 0.0) FROM FlatApartmentTbl AS Flat
+                  WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID)"""
+
+# The rows whose summary columns don't match the rows they sum up, used to fill the columns in for existing data
+flat_summary_pending_SQL = """
+NumTenants != (SELECT COUNT(*) FROM TenantTbl WHERE TenantTbl.FlatID = FlatApartmentTbl.FlatID)"""
+
+apartment_summary_pending_SQL = """
+NumFlats != (SELECT COUNT(*) FROM FlatApartmentTbl AS Flat
+             WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID)
+OR NumTenants != (SELECT COALESCE(SUM(Flat.NumTenants), 0) FROM FlatApartmentTbl AS Flat
+                  WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID)
+OR Upkeep != (SELECT COALESCE(SUM(Flat.WeeklyRent), 0.0) FROM FlatApartmentTbl AS Flat
+              WHERE Flat.ApartmentID = ApartmentTbl.ApartmentID)"""
+
+# The triggers keep the summary columns up to date whenever a tenant or flat changes.
+# A tenant trigger recounts their flat, which in turn fires the flat trigger that recounts its apartment.
+create_summary_triggers_SQL = [
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantInsertTrg AFTER INSERT ON TenantTbl
+WHEN NEW.FlatID IS NOT NULL
+BEGIN
+    {update_flat_summary_SQL} WHERE FlatID = NEW.FlatID;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantUpdateTrg AFTER UPDATE OF FlatID ON TenantTbl
+WHEN OLD.FlatID IS NOT NEW.FlatID
+BEGIN
+    {update_flat_summary_SQL} WHERE FlatID IN (OLD.FlatID, NEW.FlatID);
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantDeleteTrg AFTER DELETE ON TenantTbl
+WHEN OLD.FlatID IS NOT NULL
+BEGIN
+    {update_flat_summary_SQL} WHERE FlatID = OLD.FlatID;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatInsertTrg AFTER INSERT ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_SQL} WHERE ApartmentID = NEW.ApartmentID;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatUpdateTrg AFTER UPDATE OF ApartmentID, WeeklyRent, NumTenants ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_SQL} WHERE ApartmentID IN (OLD.ApartmentID, NEW.ApartmentID);
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatDeleteTrg AFTER DELETE ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_SQL} WHERE ApartmentID = OLD.ApartmentID;
+END;""",
+]
+
+# Indexes so the apartment listing can be sorted by its totals without sorting the whole table each time
+create_summary_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS ApartmentNumFlatsIdx ON ApartmentTbl(NumFlats);",
+    "CREATE INDEX IF NOT EXISTS ApartmentNumTenantsIdx ON ApartmentTbl(NumTenants);",
+    "CREATE INDEX IF NOT EXISTS ApartmentUpkeepIdx ON ApartmentTbl(Upkeep);",
+]
+
+
+# Full text search tables over the text of tenants, employees, apartments and payments, so that any word
+# (including the descriptions) can be searched for without reading every row. They are "external content"
+# tables, meaning they only hold the search index and read the text itself from the table they index,
+# matching rows up by rowid. The prefix option also indexes the first 2 and 3 letters of every word,
+# so searching for the start of a word ("boil*") is just as quick as searching for a whole one.
+# key is the search table, value is (table it indexes, rowid column of that table, columns searched)
+search_tables = {
+    "TenantSearchTbl": ("TenantTbl", "rowid",
+                        ("TenantForename", "TenantSurname", "TenantContact", "TenantDescription")),
+    "EmployeeSearchTbl": ("EmployeeTbl", "rowid",
+                          ("EmployeeForename", "EmployeeSurname", "EmployeeContact",
+                           "EmployeeAddress", "EmployeePostcode", "EmployeeDescription")),
+    "ApartmentSearchTbl": ("ApartmentTbl", "rowid",
+                           ("ApartmentAddress", "ApartmentPostcode", "ApartmentDescription")),
+    "PaymentSearchTbl": ("PaymentsTbl", "PaymentID",
+                         ("PaymentMethod", "PaymentDescription")),
+}
+
+create_search_tables_SQL = [
+    f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5(
+        {', '.join(columns)},
+        content='{table}', content_rowid='{rowid}',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );"""
+    for search_table, (table, rowid, columns) in search_tables.items()]
+
+# The triggers keep each search index in step with its table. An external content index has to be told
+# the old values of a row to remove it, which is done by inserting a 'delete' command.
+def _search_triggers(search_table, table, rowid, columns):
+    name = search_table.removesuffix("Tbl")
+    insert_SQL = (f"INSERT INTO {search_table}(rowid, {', '.join(columns)}) "
+                  f"VALUES (NEW.{rowid}, {', '.join(f'NEW.{column}' for column in columns)});")
+    delete_SQL = (f"INSERT INTO {search_table}({search_table}, rowid, {', '.join(columns)}) "
+                  f"VALUES ('delete', OLD.{rowid}, {', '.join(f'OLD.{column}' for column in columns)});")
+    return [f"""
+CREATE TRIGGER IF NOT EXISTS {name}InsertTrg AFTER INSERT ON {table}
+BEGIN
+    {insert_SQL}
+END;""",
+            f"""
+CREATE TRIGGER IF NOT EXISTS {name}UpdateTrg AFTER UPDATE OF {', '.join(columns)} ON {table}
+BEGIN
+    {delete_SQL}
+    {insert_SQL}
+END;""",
+            f"""
+CREATE TRIGGER IF NOT EXISTS {name}DeleteTrg AFTER DELETE ON {table}
+BEGIN
+    {delete_SQL}
+END;"""]
+
+
+create_search_triggers_SQL = [sql for search_table, (table, rowid, columns) in search_tables.items()
+                              for sql in _search_triggers(search_table, table, rowid, columns)]
+
+# Builds each search index from scratch from the rows already in its table
+rebuild_search_SQL = [f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild');"
+                      for search_table in search_tables]
+
+
+# The tables are joined on INTEGER keys rather than on the IDs shown to the user (A0000, F0000...),
+# as integers are smaller and quicker to compare, which keeps the indexes small and the joins quick.
+# The IDs are still stored (and kept unique) for display and for looking a row up from the GUI.
+# An INTEGER PRIMARY KEY is the table's rowid, so the search tables above still find their rows.
+# These are the tables as they are after migration 5, which rebuilds the tables above into them.
+KeyedEmployeeTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewEmployeeTbl(
+        EmployeeKey             INTEGER     PRIMARY KEY,
+        EmployeeID              TEXT        NOT NULL    UNIQUE,
+        EmployeeForename        TEXT        NOT NULL,
+        EmployeeSurname         TEXT        NOT NULL,
+        EmployeeContact         TEXT        NOT NULL,
+        EmployeeAddress         TEXT        NOT NULL,
+        EmployeePostcode        TEXT        NOT NULL,
+        EmployeeDescription     TEXT
+        );"""
+
+KeyedEmployeePaymentsTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewEmployeePaymentsTbl(
+        PaymentID               INTEGER     NOT NULL,
+        EmployeeKey             INTEGER     NOT NULL,
+        FOREIGN KEY(PaymentID)  REFERENCES  PaymentsTbl(PaymentID),
+        FOREIGN KEY(EmployeeKey) REFERENCES EmployeeTbl(EmployeeKey),
+        PRIMARY KEY(PaymentID, EmployeeKey)
+        ) WITHOUT ROWID;"""
+
+KeyedFlatPaymentsTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewFlatPaymentsTbl(
+        PaymentID               INTEGER     NOT NULL,
+        TenantKey               INTEGER     NOT NULL,
+        FOREIGN KEY(PaymentID)  REFERENCES  PaymentsTbl(PaymentID),
+        FOREIGN KEY(TenantKey)  REFERENCES  TenantTbl(TenantKey),
+        PRIMARY KEY(PaymentID, TenantKey)
+        ) WITHOUT ROWID;"""
+
+KeyedTenantTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewTenantTbl(
+        TenantKey               INTEGER     PRIMARY KEY,
+        TenantID                TEXT        NOT NULL    UNIQUE,
+        FlatKey                 INTEGER,
+        TenantForename          TEXT        NOT NULL,
+        TenantSurname           TEXT        NOT NULL,
+        TenantContact           TEXT        NOT NULL,
+        TenantDescription       TEXT,
+        FOREIGN KEY(FlatKey)    REFERENCES  FlatApartmentTbl(FlatKey)
+        );"""
+
+KeyedFlatApartmentTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewFlatApartmentTbl(
+        FlatKey                 INTEGER     PRIMARY KEY,
+        FlatID                  TEXT        NOT NULL    UNIQUE,
+        ApartmentKey            INTEGER     NOT NULL,
+        FlatNumber              INTEGER     NOT NULL,
+        WeeklyRent              REAL        NOT NULL,
+        FlatDescription         TEXT,
+        NumTenants              INTEGER     NOT NULL    DEFAULT 0,
+        FOREIGN KEY(ApartmentKey) REFERENCES ApartmentTbl(ApartmentKey)
+        );"""
+
+KeyedApartmentTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewApartmentTbl(
+        ApartmentKey            INTEGER     PRIMARY KEY,
+        ApartmentID             TEXT        NOT NULL    UNIQUE,
+        ApartmentAddress        TEXT        NOT NULL,
+        ApartmentPostcode       TEXT        NOT NULL,
+        ApartmentDescription    TEXT,
+        NumFlats                INTEGER     NOT NULL    DEFAULT 0,
+        NumTenants              INTEGER     NOT NULL    DEFAULT 0,
+        Upkeep                  REAL        NOT NULL    DEFAULT 0.0
+        );"""
+
+# The rows are copied across with each row's rowid as its new key (so the search tables still match them up),
+# and the IDs the rows used to be linked by are swapped for the keys of the rows they point to.
+# Link rows pointing at a row that no longer exists can't be given a key, so they aren't copied.
+# key is the table, value is (column only the new table has, SQL to create it, SQL to copy the rows into it)
+keyed_tables = {
+    "ApartmentTbl": ("ApartmentKey", KeyedApartmentTbl_SQL, """
+INSERT INTO NewApartmentTbl(ApartmentKey, ApartmentID, ApartmentAddress, ApartmentPostcode,
+                            ApartmentDescription, NumFlats, NumTenants, Upkeep)
+SELECT rowid, ApartmentID, ApartmentAddress, ApartmentPostcode,
+       ApartmentDescription, NumFlats, NumTenants, Upkeep
+FROM ApartmentTbl;"""),
+    "FlatApartmentTbl": ("FlatKey", KeyedFlatApartmentTbl_SQL, """
+INSERT INTO NewFlatApartmentTbl(FlatKey, FlatID, ApartmentKey, FlatNumber,
+                                WeeklyRent, FlatDescription, NumTenants)
+SELECT FlatApartmentTbl.rowid, FlatID, ApartmentTbl.rowid, FlatNumber,
+       WeeklyRent, FlatDescription, FlatApartmentTbl.NumTenants
+FROM FlatApartmentTbl INNER JOIN ApartmentTbl
+ON FlatApartmentTbl.ApartmentID = ApartmentTbl.ApartmentID;"""),
+    "TenantTbl": ("TenantKey", KeyedTenantTbl_SQL, """
+INSERT INTO NewTenantTbl(TenantKey, TenantID, FlatKey, TenantForename,
+                         TenantSurname, TenantContact, TenantDescription)
+SELECT TenantTbl.rowid, TenantID, FlatApartmentTbl.rowid, TenantForename,
+       TenantSurname, TenantContact, TenantDescription
+FROM TenantTbl LEFT JOIN FlatApartmentTbl
+ON TenantTbl.FlatID = FlatApartmentTbl.FlatID;"""),
+    "EmployeeTbl": ("EmployeeKey", KeyedEmployeeTbl_SQL, """
+INSERT INTO NewEmployeeTbl(EmployeeKey, EmployeeID, EmployeeForename, EmployeeSurname,
+                           EmployeeContact, EmployeeAddress, EmployeePostcode, EmployeeDescription)
+SELECT rowid, EmployeeID, EmployeeForename, EmployeeSurname,
+       EmployeeContact, EmployeeAddress, EmployeePostcode, EmployeeDescription
+FROM EmployeeTbl;"""),
+    "FlatPaymentsTbl": ("TenantKey", KeyedFlatPaymentsTbl_SQL, """
+INSERT INTO NewFlatPaymentsTbl(PaymentID, TenantKey)
+SELECT PaymentID, TenantTbl.rowid
+FROM FlatPaymentsTbl INNER JOIN TenantTbl
+ON FlatPaymentsTbl.TenantID = TenantTbl.TenantID;"""),
+    "EmployeePaymentsTbl": ("EmployeeKey", KeyedEmployeePaymentsTbl_SQL, """
+INSERT INTO NewEmployeePaymentsTbl(PaymentID, EmployeeKey)
+SELECT PaymentID, EmployeeTbl.rowid
+FROM EmployeePaymentsTbl INNER JOIN EmployeeTbl
+ON EmployeePaymentsTbl.EmployeeID = EmployeeTbl.EmployeeID;"""),
+}
+
+# The triggers on the tables being rebuilt have to be dropped first, as they would be left pointing at tables
+# that no longer exist part way through. The search triggers are made again as they were,
+# and the summary triggers are made again to use the keys.
+drop_triggers_SQL = [f"DROP TRIGGER IF EXISTS {name};" for name in (
+    "TenantInsertTrg", "TenantUpdateTrg", "TenantDeleteTrg",
+    "FlatInsertTrg", "FlatUpdateTrg", "FlatDeleteTrg",
+    *(f"{search_table.removesuffix('Tbl')}{event}Trg" for search_table in search_tables
+      for event in ("Insert", "Update", "Delete")))]
+
+keyed_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS TenantFlatIdx ON TenantTbl(FlatKey);",
+    "CREATE INDEX IF NOT EXISTS TenantForenameIdx ON TenantTbl(TenantForename COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS TenantSurnameIdx ON TenantTbl(TenantSurname COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS EmployeeForenameIdx ON EmployeeTbl(EmployeeForename COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS EmployeeSurnameIdx ON EmployeeTbl(EmployeeSurname COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS FlatApartmentIdx ON FlatApartmentTbl(ApartmentKey, FlatNumber);",
+    "CREATE INDEX IF NOT EXISTS ApartmentAddressIdx ON ApartmentTbl(ApartmentAddress);",
+    "CREATE INDEX IF NOT EXISTS FlatPaymentsTenantIdx ON FlatPaymentsTbl(TenantKey);",
+    "CREATE INDEX IF NOT EXISTS EmployeePaymentsEmployeeIdx ON EmployeePaymentsTbl(EmployeeKey);",
+    *create_summary_indexes_SQL,
+]
+
+# IDs are sorted by their length first so that those past 9999 (such as T10000) stay in number order,
+# so these indexes let the ID sorts and the search for the next free ID read the IDs in that order.
+create_id_order_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS ApartmentIDOrderIdx ON ApartmentTbl(length(ApartmentID), ApartmentID);",
+    "CREATE INDEX IF NOT EXISTS FlatIDOrderIdx ON FlatApartmentTbl(length(FlatID), FlatID);",
+    "CREATE INDEX IF NOT EXISTS TenantIDOrderIdx ON TenantTbl(length(TenantID), TenantID);",
+    "CREATE INDEX IF NOT EXISTS EmployeeIDOrderIdx ON EmployeeTbl(length(EmployeeID), EmployeeID);",
+]
+
+update_flat_summary_keyed_SQL = """
+UPDATE FlatApartmentTbl SET
+        NumTenants = (SELECT COUNT(*) FROM TenantTbl WHERE TenantTbl.FlatKey = FlatApartmentTbl.FlatKey)"""
+
+update_apartment_summary_keyed_SQL = """
+UPDATE ApartmentTbl SET
+        NumFlats = (SELECT COUNT(*) FROM FlatApartmentTbl AS Flat
+                    WHERE Flat.ApartmentKey = ApartmentTbl.ApartmentKey),
+        NumTenants = (SELECT COALESCE(SUM(Flat.NumTenants), 0) FROM FlatApartmentTbl AS Flat
+                      WHERE Flat.ApartmentKey = ApartmentTbl.ApartmentKey),
+        Upkeep = (SELECT COALESCE(SUM(Flat.WeeklyRent), 0.0) FROM FlatApartmentTbl AS Flat
+                  WHERE Flat.ApartmentKey = ApartmentTbl.ApartmentKey)"""
+
+create_summary_triggers_keyed_SQL = [
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantInsertTrg AFTER INSERT ON TenantTbl
+WHEN NEW.FlatKey IS NOT NULL
+BEGIN
+    {update_flat_summary_keyed_SQL} WHERE FlatKey = NEW.FlatKey;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantUpdateTrg AFTER UPDATE OF FlatKey ON TenantTbl
+WHEN OLD.FlatKey IS NOT NEW.FlatKey
+BEGIN
+    {update_flat_summary_keyed_SQL} WHERE FlatKey IN (OLD.FlatKey, NEW.FlatKey);
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS TenantDeleteTrg AFTER DELETE ON TenantTbl
+WHEN OLD.FlatKey IS NOT NULL
+BEGIN
+    {update_flat_summary_keyed_SQL} WHERE FlatKey = OLD.FlatKey;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatInsertTrg AFTER INSERT ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_keyed_SQL} WHERE ApartmentKey = NEW.ApartmentKey;
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatUpdateTrg AFTER UPDATE OF ApartmentKey, WeeklyRent, NumTenants ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_keyed_SQL} WHERE ApartmentKey IN (OLD.ApartmentKey, NEW.ApartmentKey);
+END;""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS FlatDeleteTrg AFTER DELETE ON FlatApartmentTbl
+BEGIN
+    {update_apartment_summary_keyed_SQL} WHERE ApartmentKey = OLD.ApartmentKey;
+END;""",
+]
+
+
+# The free IDs of each table are kept as ranges of unused numbers ("gaps") so the next free ID can be found
+# straight from an index, instead of reading every ID to look for the first one missing.
+# The last gap of each table has no real end, so it ends at MAX_ID_NUMBER, the largest number SQLite can store.
+MAX_ID_NUMBER = 9223372036854775807
+
+# key is the letter the IDs start with, value is (table, ID column)
+id_columns = {"A": ("ApartmentTbl", "ApartmentID"),
+              "F": ("FlatApartmentTbl", "FlatID"),
+              "T": ("TenantTbl", "TenantID"),
+              "E": ("EmployeeTbl", "EmployeeID")}
+
+IDGapTbl_SQL = """
+CREATE TABLE IF NOT EXISTS IDGapTbl(
+        Prefix                  TEXT        NOT NULL,
+        GapStart                INTEGER     NOT NULL,
+        GapEnd                  INTEGER     NOT NULL,
+        PRIMARY KEY(Prefix, GapStart)
+        ) WITHOUT ROWID;"""
+
+# IDs handed out by SQL.ids.reserve_id that haven't been used yet, so the same ID isn't given to anyone else
+IDReservationTbl_SQL = """
+CREATE TABLE IF NOT EXISTS IDReservationTbl(
+        Prefix                  TEXT        NOT NULL,
+        IDNumber                INTEGER     NOT NULL,
+        ReservedAt              REAL        NOT NULL,
+        PRIMARY KEY(Prefix, IDNumber)
+        ) WITHOUT ROWID;"""
+
+
+# The SQL which takes a number out of the gap it is in, splitting the gap in two around it.
+# Gaps never overlap, so the gap a number is in is the one with the highest start at or below it.
+# When an ID is used, any reservation of it is finished with too.
+def _take_id_number(prefix, number, used=True):
+    gap = f"""Prefix = {prefix} AND GapEnd >= {number}
+          AND GapStart = (SELECT MAX(GapStart) FROM IDGapTbl WHERE Prefix = {prefix} AND GapStart <= {number})"""
+    return f"""
+    INSERT INTO IDGapTbl(Prefix, GapStart, GapEnd)
+    SELECT Prefix, {number} + 1, GapEnd FROM IDGapTbl WHERE {gap} AND GapEnd > {number};
+    UPDATE IDGapTbl SET GapEnd = {number} - 1 WHERE {gap};
+    DELETE FROM IDGapTbl WHERE Prefix = {prefix} AND GapStart = {number} AND GapEnd < GapStart;""" + (f"""
+    DELETE FROM IDReservationTbl WHERE Prefix = {prefix} AND IDNumber = {number};""" if used else "")
+
+
+def _id_triggers(prefix, table, column):
+    new_number = f"CAST(substr(NEW.{column}, 2) AS INTEGER)"
+    old_number = f"CAST(substr(OLD.{column}, 2) AS INTEGER)"
+    return [f"""
+CREATE TRIGGER IF NOT EXISTS {table.removesuffix('Tbl')}IDInsertTrg AFTER INSERT ON {table}
+BEGIN{_take_id_number(f"'{prefix}'", new_number)}
+END;""",
+            f"""
+CREATE TRIGGER IF NOT EXISTS {table.removesuffix('Tbl')}IDDeleteTrg AFTER DELETE ON {table}
+BEGIN
+    INSERT OR IGNORE INTO IDGapTbl(Prefix, GapStart, GapEnd) VALUES ('{prefix}', {old_number}, {old_number});
+END;"""]
+
+
+# A reserved number is taken out of the gaps the same way as a used one,
+# so it isn't given out again while it is reserved.
+create_id_triggers_SQL = [sql for prefix, (table, column) in id_columns.items()
+                          for sql in _id_triggers(prefix, table, column)] + [f"""
+CREATE TRIGGER IF NOT EXISTS IDReservationInsertTrg AFTER INSERT ON IDReservationTbl
+BEGIN{_take_id_number("NEW.Prefix", "NEW.IDNumber", used=False)}
+END;"""]
+
+# Works out the gaps between the IDs already in each table, including the gap after the last one
+fill_id_gaps_SQL = [f"""
+INSERT INTO IDGapTbl(Prefix, GapStart, GapEnd)
+SELECT '{prefix}', IDNumber + 1, COALESCE(NextIDNumber - 1, {MAX_ID_NUMBER})
+FROM (SELECT IDNumber, LEAD(IDNumber) OVER (ORDER BY IDNumber) AS NextIDNumber
+      FROM (SELECT -1 AS IDNumber
+            UNION
+            SELECT CAST(substr({column}, 2) AS INTEGER) FROM {table}))
+WHERE NextIDNumber IS NULL OR NextIDNumber > IDNumber + 1;""" for prefix, (table, column) in id_columns.items()]
+
+
+# The apartment totals already have indexes (see above), so this lets the payment amount searches
+# such as ">500" or "200..400" look up the matching payments of each type instead of checking every one.
+create_number_search_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS PaymentTypeTotalPaidIdx ON PaymentsTbl(PaymentType, TotalPaid);",
+]
+
+
+# Each payment points straight at its payee with PayeeKey, which is the key of a tenant for an inbound payment
+# or of an employee for an outbound one, so the payment type says which table the key belongs to.
+# This replaces the FlatPaymentsTbl and EmployeePaymentsTbl link tables, so listing every payment is one read
+# of PaymentsTbl in date order, rather than two joins put together and then sorted.
+# SQLite can't check a key that points at one of two tables, so PayeeKey has no FOREIGN KEY.
+# This is the table as it is after migration 9, which rebuilds PaymentsTbl into it.
+PayeePaymentsTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewPaymentsTbl(
+        PaymentID               INTEGER     PRIMARY KEY     AUTOINCREMENT,
+        PaymentType             TEXT        NOT NULL,
+        PayeeKey                INTEGER,
+        PaymentMethod           TEXT        NOT NULL,
+        TotalPaid               REAL        NOT NULL,
+        PaymentDate             TEXT        NOT NULL,
+        PaymentTime             TEXT        NOT NULL,
+        PaymentDescription      TEXT
+        );"""
+
+# Payments without a link row (or with one of the wrong type) are copied without a payee, as they were never shown.
+copy_payee_payments_SQL = """
+INSERT INTO NewPaymentsTbl(PaymentID, PaymentType, PayeeKey, PaymentMethod, TotalPaid,
+                           PaymentDate, PaymentTime, PaymentDescription)
+SELECT PaymentID, PaymentType,
+       CASE PaymentType
+           WHEN 'Inbound' THEN (SELECT MIN(TenantKey) FROM FlatPaymentsTbl
+                                WHERE FlatPaymentsTbl.PaymentID = PaymentsTbl.PaymentID)
+           WHEN 'Outbound' THEN (SELECT MIN(EmployeeKey) FROM EmployeePaymentsTbl
+                                 WHERE EmployeePaymentsTbl.PaymentID = PaymentsTbl.PaymentID)
+       END,
+       PaymentMethod, TotalPaid, PaymentDate, PaymentTime, PaymentDescription
+FROM PaymentsTbl;"""
+
+drop_payment_search_triggers_SQL = [f"DROP TRIGGER IF EXISTS PaymentSearch{event}Trg;"
+                                    for event in ("Insert", "Update", "Delete")]
+
+create_payment_search_triggers_SQL = _search_triggers("PaymentSearchTbl", *search_tables["PaymentSearchTbl"])
+
+drop_payment_links_SQL = [
+    "DROP TABLE IF EXISTS FlatPaymentsTbl;",
+    "DROP TABLE IF EXISTS EmployeePaymentsTbl;",
+]
+
+# The indexes on PaymentsTbl go with the old table, so they are made again, along with one in date order
+# for listing every payment and one for finding the payments of a tenant or employee.
+payee_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS PaymentDateTimeIdx ON PaymentsTbl(PaymentDate, PaymentTime);",
+    "CREATE INDEX IF NOT EXISTS PaymentTypeDateTimeIdx ON PaymentsTbl(PaymentType, PaymentDate, PaymentTime);",
+    "CREATE INDEX IF NOT EXISTS PaymentPayeeIdx ON PaymentsTbl(PaymentType, PayeeKey, PaymentDate, PaymentTime);",
+    *create_number_search_indexes_SQL,
+]
+
+
+# Deleting a row now deals with the rows pointing at it in the same statement: deleting an apartment deletes
+# its flats, and deleting a flat leaves its tenants without a flat. SQLite only checks foreign keys (and carries
+# out these actions) when PRAGMA foreign_keys is on, which every connection does (see SQL.profiles).
+# These are the tables as they are after migration 10, which rebuilds the tables above into them.
+CascadeFlatApartmentTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewFlatApartmentTbl(
+        FlatKey                 INTEGER     PRIMARY KEY,
+        FlatID                  TEXT        NOT NULL    UNIQUE,
+        ApartmentKey            INTEGER     NOT NULL,
+        FlatNumber              INTEGER     NOT NULL,
+        WeeklyRent              REAL        NOT NULL,
+        FlatDescription         TEXT,
+        NumTenants              INTEGER     NOT NULL    DEFAULT 0,
+        FOREIGN KEY(ApartmentKey) REFERENCES ApartmentTbl(ApartmentKey) ON DELETE CASCADE
+        );"""
+
+CascadeTenantTbl_SQL = """
+CREATE TABLE IF NOT EXISTS NewTenantTbl(
+        TenantKey               INTEGER     PRIMARY KEY,
+        TenantID                TEXT        NOT NULL    UNIQUE,
+        FlatKey                 INTEGER,
+        TenantForename          TEXT        NOT NULL,
+        TenantSurname           TEXT        NOT NULL,
+        TenantContact           TEXT        NOT NULL,
+        TenantDescription       TEXT,
+        FOREIGN KEY(FlatKey)    REFERENCES  FlatApartmentTbl(FlatKey) ON DELETE SET NULL
+        );"""
+
+# Rows already pointing at a row that no longer exists are dealt with as if it had been deleted since,
+# so flats of a deleted apartment aren't copied and tenants of a deleted flat are left without a flat.
+# The flats are rebuilt first so the tenants of the flats left out lose their flat too.
+# key is the table, value is (SQL to create it, SQL to copy the rows into it)
+cascade_tables = {
+    "FlatApartmentTbl": (CascadeFlatApartmentTbl_SQL, """
+INSERT INTO NewFlatApartmentTbl(FlatKey, FlatID, ApartmentKey, FlatNumber,
+                                WeeklyRent, FlatDescription, NumTenants)
+SELECT FlatKey, FlatID, ApartmentKey, FlatNumber,
+       WeeklyRent, FlatDescription, NumTenants
+FROM FlatApartmentTbl
+WHERE ApartmentKey IN (SELECT ApartmentKey FROM ApartmentTbl);"""),
+    "TenantTbl": (CascadeTenantTbl_SQL, """
+INSERT INTO NewTenantTbl(TenantKey, TenantID, FlatKey, TenantForename,
+                         TenantSurname, TenantContact, TenantDescription)
+SELECT TenantKey, TenantID,
+       CASE WHEN FlatKey IN (SELECT FlatKey FROM FlatApartmentTbl) THEN FlatKey END,
+       TenantForename, TenantSurname, TenantContact, TenantDescription
+FROM TenantTbl;"""),
+}
+
+# A payment's payee can be a tenant or an employee (see PayeePaymentsTbl_SQL), which a FOREIGN KEY can't
+# point at, so deleting a tenant or employee unlinks their payments with triggers instead (as ON DELETE SET NULL
+# would). The payments are kept, as they are financial records, and are left out of the listings as before.
+create_payee_unlink_triggers_SQL = [
+    """
+CREATE TRIGGER IF NOT EXISTS TenantPaymentsUnlinkTrg AFTER DELETE ON TenantTbl
+BEGIN
+    UPDATE PaymentsTbl SET PayeeKey = NULL WHERE PaymentType = 'Inbound' AND PayeeKey = OLD.TenantKey;
+END;""",
+    """
+CREATE TRIGGER IF NOT EXISTS EmployeePaymentsUnlinkTrg AFTER DELETE ON EmployeeTbl
+BEGIN
+    UPDATE PaymentsTbl SET PayeeKey = NULL WHERE PaymentType = 'Outbound' AND PayeeKey = OLD.EmployeeKey;
+END;""",
+]
+
+# Everything on the rebuilt tables goes with the old tables, so it is all made again as it was
+cascade_triggers_SQL = [
+    *create_summary_triggers_keyed_SQL,
+    *_search_triggers("TenantSearchTbl", *search_tables["TenantSearchTbl"]),
+    *_id_triggers("F", *id_columns["F"]),
+    *_id_triggers("T", *id_columns["T"]),
+]
+
+drop_cascade_triggers_SQL = [f"DROP TRIGGER IF EXISTS {name};" for name in (
+    "TenantInsertTrg", "TenantUpdateTrg", "TenantDeleteTrg",
+    "FlatInsertTrg", "FlatUpdateTrg", "FlatDeleteTrg",
+    "TenantSearchInsertTrg", "TenantSearchUpdateTrg", "TenantSearchDeleteTrg",
+    "FlatApartmentIDInsertTrg", "FlatApartmentIDDeleteTrg", "TenantIDInsertTrg", "TenantIDDeleteTrg")]
+
+cascade_indexes_SQL = [
+    "CREATE INDEX IF NOT EXISTS FlatApartmentIdx ON FlatApartmentTbl(ApartmentKey, FlatNumber);",
+    "CREATE INDEX IF NOT EXISTS TenantFlatIdx ON TenantTbl(FlatKey);",
+    "CREATE INDEX IF NOT EXISTS TenantForenameIdx ON TenantTbl(TenantForename COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS TenantSurnameIdx ON TenantTbl(TenantSurname COLLATE NOCASE);",
+    "CREATE INDEX IF NOT EXISTS FlatIDOrderIdx ON FlatApartmentTbl(length(FlatID), FlatID);",
+    "CREATE INDEX IF NOT EXISTS TenantIDOrderIdx ON TenantTbl(length(TenantID), TenantID);",
+]
@@ -1,26 +1,26 @@
-from .main import process_sql
+from . import ids, pages, queries
+from .main import process_sql, process_many, stream_sql, transaction
 
 
 # This function gets all of the tenant records from the database
 # and is used to handle searching and sorting so that only the records the user wants to see are fetched.
 def get_free_tenant_id():
-    tenant_ids = (record[0] for record in process_sql("SELECT TenantID FROM TenantTbl ORDER BY TenantID"))
+    return ids.get_free_id("T")
 
-    index = -1
-    for index, tenant_id in enumerate(tenant_ids):
-        if f"T{index:04}" != tenant_id:
-            return f"T{index:04}"
-    return f"T{index+1:04}"
+
+# This function reserves the next free tenant ID so that it can't be taken by anyone else before it is used.
+def reserve_tenant_id():
+    return ids.reserve_id("T")
 
 
 def get_flat_id(address, flat_number):
     sql = """SELECT FlatApartmentTbl.FlatID
              FROM (FlatApartmentTbl INNER JOIN ApartmentTbl
-             ON FlatApartmentTbl.ApartmentID = ApartmentTbl.ApartmentID)
+             ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)
              WHERE (ApartmentTbl.ApartmentAddress = ? AND FlatApartmentTbl.FlatNumber = ?)"""
 
     try:
-        return process_sql(sql, parameters=(address, flat_number))[0][0]
+        return process_sql(sql, parameters=(address, flat_number), read_only=True)[0][0]
     except IndexError:
         return False
 
@@ -28,46 +28,118 @@ def get_flat_id(address, flat_number):
 def get_postcode(address):
     sql = "SELECT ApartmentPostcode FROM ApartmentTbl WHERE ApartmentAddress = ?"
 
-    return process_sql(sql, parameters=(address,))
+    return process_sql(sql, parameters=(address,), read_only=True)
+
+
+# The columns the tenant listing can be sorted and searched by
+TENANT_FIELDS = ("TenantID", "TenantForename", "TenantSurname", "TenantContact",
+                 "ApartmentAddress", "FlatNumber", "ApartmentPostcode")
+
+TENANTS_SQL = """SELECT TenantID, TenantForename, TenantSurname, TenantContact, 
+                      ApartmentAddress, FlatNumber, ApartmentPostcode 
+               FROM ((TenantTbl 
+               LEFT JOIN FlatApartmentTbl ON TenantTbl.FlatKey = FlatApartmentTbl.FlatKey)
+               LEFT JOIN ApartmentTbl ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)"""
+
+queries.define("tenants", TENANTS_SQL + """{search}
+                             ORDER BY {sort}""",
+               search=queries.searches(TENANT_FIELDS, "WHERE"),
+               sort={**queries.columns(TENANT_FIELDS), "TenantID": queries.id_order("TenantID")})
+
+# The keys each sort of the tenant listing is paged by (see SQL.pages), the tenants with the same
+# value being kept in ID order. Tenants without a flat have no flat or apartment details to sort by.
+TENANT_PAGE_SORTS = pages.sorts(TENANT_FIELDS,
+                                (pages.key("TenantID", expression="length({})"), pages.key("TenantID")),
+                                nullable=("ApartmentAddress", "FlatNumber", "ApartmentPostcode"))
 
+queries.define("tenants_page", pages.template(TENANTS_SQL + "{search}"),
+               search=queries.searches(TENANT_FIELDS, "WHERE"),
+               page=pages.options(TENANT_PAGE_SORTS))
 
-def get_tenants(sort_field, search_field, search_term):
-    sql = f"""SELECT TenantID, TenantForename, TenantSurname, TenantContact, 
-                    ApartmentAddress, FlatNumber, ApartmentPostcode 
-              FROM ((TenantTbl 
-              LEFT JOIN FlatApartmentTbl ON TenantTbl.FlatID = FlatApartmentTbl.FlatID)
-              LEFT JOIN ApartmentTbl ON FlatApartmentTbl.ApartmentID = ApartmentTbl.ApartmentID)"""
 
-    params = tuple()
+def _search(search_field, search_term):
     if search_term not in ("*", ""):
-        params = (f"{search_term}%",)
-        sql += f"\nWHERE {search_field} LIKE ? COLLATE NOCASE"
-    sql += f"\nORDER BY {sort_field}"
+        return search_field, (f"{search_term}%",)
+    return None, ()
 
-    return process_sql(sql, parameters=params)
+
+# This function gets all of the tenant records alongside their flat and apartment details.
+# If 'stream' is True the records are returned as an iterator which fetches them in batches.
+def get_tenants(sort_field, search_field, search_term, stream=False):
+    search_field, params = _search(search_field, search_term)
+    sql = queries.get("tenants", search=search_field, sort=sort_field)
+
+    if stream:
+        return stream_sql(sql, parameters=params)
+    return process_sql(sql, parameters=params, read_only=True)
+
+
+# This function gets one page of the tenant listing as a SQL.pages.Page, carrying on from
+# the cursor of the page before it (or after it, if 'direction' is "previous").
+def get_tenants_page(sort_field, search_field, search_term, cursor=None, direction="next",
+                     page_size=pages.PAGE_SIZE):
+    search_field, params = _search(search_field, search_term)
+    return pages.get_page("tenants_page", TENANT_PAGE_SORTS, sort_field, params, cursor, direction, page_size,
+                          search=search_field)
 
 
 def get_tenant(tenant_id):
     sql = """SELECT TenantForename, TenantSurname, TenantContact, 
                     ApartmentAddress, FlatNumber, TenantDescription FROM ((TenantTbl 
-             LEFT JOIN FlatApartmentTbl ON TenantTbl.FlatID = FlatApartmentTbl.FlatID)
-             LEFT JOIN ApartmentTbl ON FlatApartmentTbl.ApartmentID = ApartmentTbl.ApartmentID)
+             LEFT JOIN FlatApartmentTbl ON TenantTbl.FlatKey = FlatApartmentTbl.FlatKey)
+             LEFT JOIN ApartmentTbl ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)
              WHERE TenantID = ?"""
 
-    return process_sql(sql, parameters=(tenant_id,))
+    return process_sql(sql, parameters=(tenant_id,), read_only=True)
+
+
+# This function gets many tenants at once as a dictionary keyed by tenant ID, leaving out the IDs
+# that aren't in the database. Each record has the ID of the tenant's flat as well as where it is.
+def get_tenants_by_ids(tenant_ids):
+    sql = f"""SELECT TenantID, TenantForename, TenantSurname, TenantContact,
+                     FlatID, ApartmentAddress, FlatNumber, TenantDescription FROM ((TenantTbl
+              LEFT JOIN FlatApartmentTbl ON TenantTbl.FlatKey = FlatApartmentTbl.FlatKey)
+              LEFT JOIN ApartmentTbl ON FlatApartmentTbl.ApartmentKey = ApartmentTbl.ApartmentKey)
+              WHERE TenantID {queries.IN_LIST}"""
+
+    records = process_sql(sql, parameters=(queries.json_list(tenant_ids),), read_only=True)
+    return {record.TenantID: record for record in records}
+
+
+# These functions check for tenants without fetching them (or joining their flat and apartment), for validation.
+def tenant_exists(tenant_id):
+    sql = "SELECT EXISTS(SELECT 1 FROM TenantTbl WHERE TenantID = ?)"
+    return bool(process_sql(sql, parameters=(tenant_id,), read_only=True)[0][0])
+
+
+def get_num_tenants():
+    return process_sql("SELECT COUNT(*) FROM TenantTbl", read_only=True)[0][0]
 
 
 def add_tenant(record):
-    sql = """INSERT INTO TenantTbl(TenantID, FlatID, 
+    sql = """INSERT INTO TenantTbl(TenantID, FlatKey, 
                                    TenantForename, TenantSurname, 
                                    TenantContact, TenantDescription)
-             VALUES (?, ?, ?, ?, ?, ?)"""
+             VALUES (?, (SELECT FlatKey FROM FlatApartmentTbl WHERE FlatID = ?), ?, ?, ?, ?)"""
     process_sql(sql, parameters=record)
 
 
+# This function adds many tenants at once in a single transaction,
+# returning the IDs of the tenants added in the same order as the records given.
+def add_tenants(records):
+    records = list(records)
+    sql = """INSERT INTO TenantTbl(TenantID, FlatKey, 
+                                   TenantForename, TenantSurname, 
+                                   TenantContact, TenantDescription)
+             VALUES (?, (SELECT FlatKey FROM FlatApartmentTbl WHERE FlatID = ?), ?, ?, ?, ?)"""
+    with transaction():
+        process_many(sql, records)
+    return [record[0] for record in records]
+
+
 def edit_tenant(tenant_id, record):
     sql = """UPDATE TenantTbl SET
-             FlatID = ?,
+             FlatKey = (SELECT FlatKey FROM FlatApartmentTbl WHERE FlatID = ?),
              TenantForename = ?,
              TenantSurname = ?,
              TenantContact = ?,
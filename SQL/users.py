@@ -4,17 +4,22 @@ from .main import process_sql
 
 def find_hash(username):
     sql = "SELECT PasswordHash FROM LoginTbl WHERE Username=?"
-    return process_sql(sql, parameters=(username,))
+    return process_sql(sql, parameters=(username,), read_only=True)
+
+
+def user_exists(username):
+    sql = "SELECT EXISTS(SELECT 1 FROM LoginTbl WHERE Username=?)"
+    return bool(process_sql(sql, parameters=(username,), read_only=True)[0][0])
 
 
 def get_num_users():
     sql = "SELECT COUNT(*) FROM LoginTbl"
-    return process_sql(sql)[0][0]
+    return process_sql(sql, read_only=True)[0][0]
 
 
 def get_users():
     sql = "SELECT Username FROM LoginTbl"
-    return process_sql(sql)
+    return process_sql(sql, read_only=True)
 
 
 def add_user(username, password):
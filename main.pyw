@@ -1,5 +1,7 @@
 # base imports
 import os
+import logging
+import configparser
 
 # module imports
 import GUI
@@ -11,9 +13,22 @@ if not os.path.isdir(cwd):
     os.mkdir(cwd)
 os.chdir(cwd)
 
-# Establishes the connection to the database and creates the tables if they do not already exist.
-SQL.main.establish_connection('Prototype.db')
-SQL.main.create_tables()
+# As this runs without a console, anything logged (such as the database settings) is written to a file.
+logging.basicConfig(filename='system.log', level=logging.INFO,
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+# The database settings can be changed in settings.ini without editing the code, for example:
+#   [database]
+#   profile = durable
+#   pool_size = 4
+config = configparser.ConfigParser()
+config.read('settings.ini')
+profile = config.get('database', 'profile', fallback=SQL.profiles.DEFAULT_PROFILE)
+pool_size = config.getint('database', 'pool_size', fallback=4)
+
+# Establishes the connection to the database and brings it up to date, creating the tables if they don't exist.
+SQL.main.establish_connection('Prototype.db', pool_size=pool_size, profile=profile)
+SQL.migrations.migrate()
 
 # Creates the application
 GUI.Application()
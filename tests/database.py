@@ -0,0 +1,67 @@
+"""
+This file contains the base class of the tests that need a database. Each test class gets
+its own database file in a temporary folder, brought up to date by the migrations as on startup.
+"""
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import SQL
+
+
+class DatabaseTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        SQL.main.establish_connection(str(Path(cls.folder) / "test.db"))
+        SQL.migrations.migrate()
+
+    @classmethod
+    def tearDownClass(cls):
+        SQL.main.close_connection()
+        shutil.rmtree(cls.folder, ignore_errors=True)
+
+    # This function fills the database with apartments, flats, tenants, employees and payments,
+    # with some of the tenants left without a flat.
+    @staticmethod
+    def add_sample_data(num_apartments=50, num_flats=250, num_tenants=750, num_employees=50, num_payments=5000):
+        SQL.apartments.add_apartments((f"A{i:04}", f"{i} High Street", f"AB{i % 9 + 1} {i % 7}CD", "")
+                                      for i in range(num_apartments))
+        SQL.flats.add_flats((f"F{i:04}", f"A{i % num_apartments:04}", i // num_apartments + 1, 100 + i % 50, "")
+                            for i in range(num_flats))
+        SQL.tenants.add_tenants((f"T{i:04}", f"F{i % num_flats:04}" if i % 5 else None,
+                                 ("Ann", "Bob", "Cat")[i % 3], ("Dan", "Eve", "Fay")[i % 3], "07000000000", "")
+                                for i in range(num_tenants))
+        SQL.employees.add_employees((f"E{i:04}", "Gus", "Hal", "07000000000", f"{i} Low Street", "CD1 2EF", "")
+                                    for i in range(num_employees))
+        SQL.payments.add_payments(((("Inbound", "Cash", i % 500, f"2024-{i % 12 + 1:02}-{i % 28 + 1:02}", "10:00", ""),
+                                    f"T{i % num_tenants:04}")
+                                   if i % 2 else
+                                   (("Outbound", "Bank", i % 300, f"2024-{i % 12 + 1:02}-{i % 28 + 1:02}", "11:30",
+                                     ""), f"E{i % num_employees:04}"))
+                                  for i in range(num_payments))
+
+    # This function runs 'function' and returns the statements it ran through the process_sql
+    # of its module, as (sql, parameters) pairs.
+    @staticmethod
+    def statements_run(function, *args, **kwargs):
+        module = sys.modules[function.__module__]
+        process_sql = SQL.main.process_sql
+        statements = []
+
+        def recording_process_sql(sql, parameters=(), read_only=False):
+            statements.append((sql, parameters))
+            return process_sql(sql, parameters=parameters, read_only=read_only)
+
+        with mock.patch.object(module, "process_sql", recording_process_sql):
+            function(*args, **kwargs)
+        return statements
+
+    # The query plan of a statement as a list of the plan's lines
+    @staticmethod
+    def query_plan(sql, parameters=()):
+        with SQL.main.pool.connection() as conn:
+            return [row[-1] for row in SQL.main.explain_sql(conn, sql, parameters)]
@@ -0,0 +1,87 @@
+"""
+These tests check that the ID allocator hands out the lowest free ID, never hands out the same ID twice,
+and gives IDs back when they are freed.
+"""
+import time
+from unittest import mock
+
+import SQL
+from SQL import ids
+from tests.database import DatabaseTestCase
+
+process_sql = SQL.main.process_sql
+
+
+class IDTest(DatabaseTestCase):
+    # Deleting the apartments and releasing the reservations frees every ID again for the next test
+    def tearDown(self):
+        process_sql("DELETE FROM ApartmentTbl")
+        for reservation in process_sql("SELECT Prefix, IDNumber FROM IDReservationTbl"):
+            ids.release_id(ids.format_id(reservation.Prefix, reservation.IDNumber))
+
+    @staticmethod
+    def add_apartments(*apartment_ids):
+        SQL.apartments.add_apartments((apartment_id, "1 High Street", "AB1 2CD", "") for apartment_id in apartment_ids)
+
+    def test_empty_table(self):
+        for prefix in "AFTE":
+            self.assertEqual(ids.get_free_id(prefix), f"{prefix}0000")
+
+    def test_lowest_free_id(self):
+        self.add_apartments("A0000", "A0001", "A0002", "A0005")
+        self.assertEqual(ids.get_free_id("A"), "A0003")
+
+        self.add_apartments("A0003", "A0004")
+        self.assertEqual(ids.get_free_id("A"), "A0006")
+
+    def test_deleted_ids_are_free_again(self):
+        self.add_apartments("A0000", "A0001", "A0002")
+        SQL.apartments.delete_apartment("A0001")
+        self.assertEqual(ids.get_free_id("A"), "A0001")
+
+        SQL.apartments.delete_apartment("A0000")
+        self.assertEqual(ids.get_free_id("A"), "A0000")
+        self.add_apartments("A0000", "A0001")
+        self.assertEqual(ids.get_free_id("A"), "A0003")
+
+    def test_ids_past_9999(self):
+        self.add_apartments(*(ids.format_id("A", number) for number in range(10000)))
+        self.assertEqual(ids.get_free_id("A"), "A10000")
+
+        self.add_apartments("A10000")
+        self.assertEqual(ids.get_free_id("A"), "A10001")
+
+    def test_reserved_ids_are_not_handed_out_again(self):
+        first = ids.reserve_id("A")
+        second = ids.reserve_id("A")
+        self.assertEqual((first, second), ("A0000", "A0001"))
+        self.assertEqual(ids.get_free_id("A"), "A0002")
+
+        # using a reserved ID ends its reservation, and the ID stays taken
+        self.add_apartments(first)
+        self.assertEqual(process_sql("SELECT COUNT(*) FROM IDReservationTbl")[0][0], 1)
+        ids.release_id(first)
+        self.assertEqual(ids.get_free_id("A"), "A0002")
+
+    def test_released_ids_are_free_again(self):
+        reserved = ids.reserve_id("A")
+        ids.reserve_id("A")
+        ids.release_id(reserved)
+        self.assertEqual(ids.get_free_id("A"), reserved)
+
+        # releasing an ID that isn't reserved does nothing
+        ids.release_id(reserved)
+        self.assertEqual(ids.reserve_id("A"), reserved)
+        self.assertEqual(ids.get_free_id("A"), "A0002")
+
+    def test_expired_reservations_are_released(self):
+        reserved = ids.reserve_id("A")
+        with mock.patch("time.time", return_value=time.time() + ids.RESERVATION_TIMEOUT + 1):
+            self.assertEqual(ids.reserve_id("A"), reserved)
+
+    def test_unknown_prefix(self):
+        for function in (ids.get_free_id, ids.reserve_id):
+            with self.assertRaises(ValueError):
+                function("X")
+        with self.assertRaises(ValueError):
+            ids.release_id("X0000")
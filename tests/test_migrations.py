@@ -0,0 +1,125 @@
+"""
+These tests check that the migrations bring both new databases and databases made by
+earlier versions of the program up to date, and that running them again is always safe.
+"""
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import SQL
+from SQL import migrations, tables
+
+process_sql = SQL.main.process_sql
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.db_filename = str(Path(self.folder) / "test.db")
+
+    def tearDown(self):
+        SQL.main.close_connection()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    # Makes a database as the first version of the program did, with no migrations run and foreign keys off
+    def make_old_database(self):
+        conn = sqlite3.connect(self.db_filename)
+        for sql in tables.create_tables_SQL:
+            conn.execute(sql)
+        conn.execute("INSERT INTO ApartmentTbl VALUES ('A0000', '1 High Street', 'AB1 2CD', '')")
+        conn.execute("INSERT INTO FlatApartmentTbl VALUES ('F0000', 'A0000', 1, 250, '')")
+        conn.execute("INSERT INTO FlatApartmentTbl VALUES ('F0001', 'A0000', 2, 300, '')")
+        conn.execute("INSERT INTO TenantTbl VALUES ('T0000', 'F0000', 'Ann', 'Dan', '07000000000', '')")
+        conn.execute("INSERT INTO TenantTbl VALUES ('T0001', NULL, 'Bob', 'Eve', '07000000000', '')")
+        conn.execute("INSERT INTO EmployeeTbl VALUES ('E0000', 'Cat', 'Fay', '07000000000', '2 Low Street', "
+                     "'CD1 2EF', '')")
+        conn.execute("INSERT INTO PaymentsTbl VALUES (1, 'Inbound', 'Cash', 250, '2024-01-01', '10:00', 'rent')")
+        conn.execute("INSERT INTO FlatPaymentsTbl VALUES (1, 'T0000')")
+        conn.execute("INSERT INTO PaymentsTbl VALUES (2, 'Outbound', 'Bank', 80, '2024-01-02', '11:00', 'repairs')")
+        conn.execute("INSERT INTO EmployeePaymentsTbl VALUES (2, 'E0000')")
+        conn.commit()
+        conn.close()
+
+    def open_database(self):
+        SQL.main.establish_connection(self.db_filename)
+
+    def assertUpToDate(self):
+        self.assertEqual(migrations.get_version(), migrations.LATEST_VERSION)
+        self.assertEqual(process_sql("PRAGMA integrity_check")[0][0], "ok")
+        self.assertEqual(process_sql("PRAGMA foreign_key_check"), [])
+
+    def assertOldDataKept(self):
+        apartment = SQL.apartments.get_apartment('A0000')[0]
+        self.assertEqual((apartment.NumFlats, apartment.NumTenants, apartment.Upkeep), (2, 1, 550))
+        self.assertEqual(SQL.tenants.get_tenant('T0000')[0].FlatNumber, 1)
+        self.assertIsNone(SQL.tenants.get_tenant('T0001')[0].FlatNumber)
+
+        payments = SQL.payments.get_payments_by_ids([1, 2])
+        self.assertEqual(payments[1].Payee, "T0000 Ann Dan")
+        self.assertEqual(payments[2].Payee, "E0000 Cat Fay")
+        self.assertEqual(SQL.tenants.get_free_tenant_id(), "T0002")
+
+    def test_new_database(self):
+        self.open_database()
+        migrations.migrate()
+
+        self.assertUpToDate()
+        self.assertTrue(SQL.users.user_exists('admin'))
+
+    def test_old_database(self):
+        self.make_old_database()
+        self.open_database()
+        migrations.migrate()
+
+        self.assertUpToDate()
+        self.assertOldDataKept()
+
+    def test_progress(self):
+        progress = mock.Mock()
+        self.open_database()
+        migrations.migrate(progress)
+
+        versions = [call.args[0] for call in progress.call_args_list]
+        self.assertEqual(sorted(set(versions)), [version for version, _, _ in migrations.MIGRATIONS
+                                                 if version in versions])
+        self.assertEqual(versions[-1], migrations.LATEST_VERSION)
+        for version, description, done, total in (call.args for call in progress.call_args_list):
+            self.assertLessEqual(done, total)
+
+        # nothing is run (or reported) once the database is up to date
+        progress.reset_mock()
+        migrations.migrate(progress)
+        progress.assert_not_called()
+
+    # A migration is run again from the start if the program was closed part way through it, so it must carry
+    # on from wherever it was interrupted. Each migration is interrupted after each of its steps in turn.
+    def test_interrupted_migrations(self):
+        for index, (version, description, steps) in enumerate(migrations.MIGRATIONS):
+            for interrupted_step in range(len(steps)):
+                with self.subTest(version=version, step=interrupted_step):
+                    self.make_old_database()
+                    self.open_database()
+
+                    def interrupt(progress, step=steps[interrupted_step]):
+                        step(progress)
+                        raise sqlite3.OperationalError("interrupted")
+
+                    interrupted_steps = [*steps[:interrupted_step], interrupt, *steps[interrupted_step + 1:]]
+                    interrupted = [*migrations.MIGRATIONS[:index], (version, description, interrupted_steps)]
+                    with mock.patch.object(migrations, "MIGRATIONS", interrupted):
+                        with self.assertRaises(sqlite3.OperationalError):
+                            migrations.migrate()
+                    self.assertEqual(migrations.get_version(), version - 1)
+
+                    migrations.migrate()
+                    self.assertUpToDate()
+                    self.assertOldDataKept()
+
+                    SQL.main.close_connection()
+                    Path(self.db_filename).unlink()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+These tests check that paging through a listing with SQL.pages gives the same records in the same order
+as fetching the whole listing, going forwards or backwards, whatever the page size.
+"""
+import SQL
+from tests.database import DatabaseTestCase
+
+NEWEST_FIRST = {'Date': 'DESC', 'Time': 'DESC'}
+
+
+class PageTest(DatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.add_sample_data(num_apartments=20, num_flats=100, num_tenants=300, num_employees=20, num_payments=1000)
+
+        # flat number 0 sorts right after the tenants without a flat, and many payments share a date and time
+        SQL.flats.add_flats([("F0100", "A0000", 0, 100, "")])
+        SQL.tenants.add_tenants((f"T{i:04}", "F0100" if i < 310 else None, "Ann", "Dan", "07000000000", "")
+                                for i in range(300, 315))
+        SQL.main.process_sql("UPDATE PaymentsTbl SET PaymentDate = '2024-01-01', PaymentTime = '10:00' "
+                             "WHERE PaymentID % 3 = 0")
+
+    # Fetches every page of a listing, following the cursors forwards from the first page
+    @staticmethod
+    def pages_forwards(get_page, page_size):
+        records, cursor = [], None
+        while True:
+            page = get_page(cursor=cursor, direction="next", page_size=page_size)
+            records += page.records
+            if page.next is None:
+                return records
+            cursor = page.next
+
+    # Fetches every page of a listing, following the cursors backwards from the last page
+    @staticmethod
+    def pages_backwards(get_page, page_size):
+        records, cursor = [], None
+        while True:
+            page = get_page(cursor=cursor, direction="previous", page_size=page_size)
+            records = page.records + records
+            if page.previous is None:
+                return records
+            cursor = page.previous
+
+    # The listing's records are only in one order for the columns it is sorted by,
+    # so the pages must have the same records, with the same values of 'sort_columns' in the same order.
+    def assertPagesMatch(self, listing, get_page, sort_columns):
+        def sort_values(records):
+            return [tuple(getattr(record, column) for column in sort_columns) for record in records]
+
+        for page_size in (7, 100, len(listing) + 1):
+            with self.subTest(page_size=page_size):
+                forwards = self.pages_forwards(get_page, page_size)
+                self.assertEqual(sorted(forwards), sorted(listing))
+                self.assertEqual(sort_values(forwards), sort_values(listing))
+                self.assertEqual(self.pages_backwards(get_page, page_size), forwards)
+
+    def test_tenants(self):
+        for sort_field in SQL.tenants.TENANT_FIELDS:
+            with self.subTest(sort_field=sort_field):
+                listing = SQL.tenants.get_tenants(sort_field, 'TenantID', '')
+                self.assertPagesMatch(listing, lambda **page: SQL.tenants.get_tenants_page(
+                    sort_field, 'TenantID', '', **page), (sort_field,))
+
+    def test_tenants_without_a_flat_come_first(self):
+        listing = self.pages_forwards(lambda **page: SQL.tenants.get_tenants_page(
+            'FlatNumber', 'TenantID', '', **page), page_size=7)
+        flat_numbers = [tenant.FlatNumber for tenant in listing]
+        without_flat = flat_numbers.count(None)
+        self.assertGreater(without_flat, 0)
+        self.assertEqual(flat_numbers[:without_flat], [None] * without_flat)
+        self.assertEqual(flat_numbers[without_flat:without_flat + 10], [0] * 10)
+
+    def test_apartments(self):
+        for sort_field in SQL.apartments.APARTMENT_FIELDS:
+            with self.subTest(sort_field=sort_field):
+                listing = SQL.apartments.get_apartments(sort_field, 'ApartmentID', '')
+                self.assertPagesMatch(listing, lambda **page: SQL.apartments.get_apartments_page(
+                    sort_field, 'ApartmentID', '', **page), (sort_field,))
+
+    def test_flats(self):
+        for sort_field in SQL.flats.FLAT_FIELDS:
+            with self.subTest(sort_field=sort_field):
+                listing = SQL.flats.get_flats('A0000', sort_field, 'FlatNumber', '')
+                self.assertPagesMatch(listing, lambda **page: SQL.flats.get_flats_page(
+                    'A0000', sort_field, 'FlatNumber', '', **page), (sort_field,))
+
+    def test_payments(self):
+        for payment_type in ('*', 'Inbound'):
+            for datetime_sorts in (NEWEST_FIRST, {'Date': 'ASC', 'Time': 'DESC'}):
+                for column_sort in (None, ('TotalPaid', 'ASC'), ('Payee', 'DESC')):
+                    with self.subTest(payment_type=payment_type, datetime_sorts=datetime_sorts,
+                                      column_sort=column_sort):
+                        listing = SQL.payments.get_payments(payment_type, datetime_sorts, 'Payee', '',
+                                                            column_sort=column_sort)
+                        sort_columns = (*([column_sort[0]] if column_sort else []), 'PaymentDate', 'PaymentTime')
+                        self.assertPagesMatch(listing, lambda **page: SQL.payments.get_payments_page(
+                            payment_type, datetime_sorts, 'Payee', '', column_sort, **page), sort_columns)
+
+    def test_search(self):
+        listing = SQL.tenants.get_tenants('TenantSurname', 'TenantForename', 'B')
+        self.assertTrue(listing)
+        self.assertPagesMatch(listing, lambda **page: SQL.tenants.get_tenants_page(
+            'TenantSurname', 'TenantForename', 'B', **page), ('TenantSurname',))
+
+    def test_empty_listing(self):
+        page = SQL.tenants.get_tenants_page('TenantID', 'TenantForename', 'Nobody')
+        self.assertEqual((page.records, page.previous, page.next), ([], None, None))
+
+    def test_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            SQL.tenants.get_tenants_page('TenantID', 'TenantID', '', direction="sideways")
+        with self.assertRaises(ValueError):
+            SQL.tenants.get_tenants_page('TenantID', 'TenantID', '', page_size=0)
+        with self.assertRaises(ValueError):
+            SQL.tenants.get_tenants_page('TenantDescription', 'TenantID', '')
@@ -0,0 +1,81 @@
+"""
+These tests check that the listings use the indexes made for them (see SQL.tables), by looking at
+the query plans SQLite chooses. A listing may read a whole table in the order of an index (as the full
+listings have to), but must never read a whole table to search it, or sort the rows after reading them
+when there is an index in the order of the sort.
+"""
+import SQL
+from tests.database import DatabaseTestCase
+
+NEWEST_FIRST = {'Date': 'DESC', 'Time': 'DESC'}
+
+
+class QueryPlanTest(DatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.add_sample_data()
+
+    def plan_of(self, function, *args):
+        statements = self.statements_run(function, *args)
+        self.assertEqual(len(statements), 1)
+        return self.query_plan(*statements[0])
+
+    # Every table read in full must be read in the order of an index, and the rows must not be sorted afterwards
+    def assertIndexed(self, plan):
+        for line in plan:
+            if line.startswith("SCAN ") and not line.startswith(("SCAN CONSTANT ROW", "SCAN json_each")):
+                self.assertIn(" USING ", line, f"table read without an index in {plan}")
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+
+    def assertSearches(self, table, index, plan):
+        self.assertTrue(any(line.startswith(f"SEARCH {table} USING") and index in line for line in plan),
+                        f"{table} not searched with {index} in {plan}")
+
+    def test_payments_newest_first(self):
+        plan = self.plan_of(SQL.payments.get_payments, '*', NEWEST_FIRST, 'Payee', '')
+        self.assertIndexed(plan)
+        self.assertIn("SCAN PaymentsTbl USING INDEX PaymentDateTimeIdx", plan)
+
+    def test_payments_oldest_first(self):
+        plan = self.plan_of(SQL.payments.get_payments, '*', {'Date': 'ASC', 'Time': 'ASC'}, 'Payee', '')
+        self.assertIndexed(plan)
+
+    def test_payments_of_one_type(self):
+        for payment_type in ('Inbound', 'Outbound'):
+            with self.subTest(payment_type=payment_type):
+                plan = self.plan_of(SQL.payments.get_payments, payment_type, NEWEST_FIRST, 'Payee', '')
+                self.assertIndexed(plan)
+                self.assertSearches("PaymentsTbl", "PaymentTypeDateTimeIdx", plan)
+
+    def test_payment_payees_are_looked_up(self):
+        plan = self.plan_of(SQL.payments.get_payments, '*', NEWEST_FIRST, 'Payee', '')
+        self.assertSearches("TenantTbl", "PRIMARY KEY", plan)
+        self.assertSearches("EmployeeTbl", "PRIMARY KEY", plan)
+
+    def test_flats_of_an_apartment(self):
+        plan = self.plan_of(SQL.flats.get_flats, 'A0003', 'FlatNumber', 'FlatNumber', '')
+        self.assertIndexed(plan)
+        self.assertSearches("FlatApartmentTbl", "FlatApartmentIdx", plan)
+        self.assertSearches("TenantTbl", "TenantFlatIdx", plan)
+
+    def test_tenants_by_id(self):
+        plan = self.plan_of(SQL.tenants.get_tenants, 'TenantID', 'TenantID', '')
+        self.assertIndexed(plan)
+        self.assertIn("SCAN TenantTbl USING INDEX TenantIDOrderIdx", plan)
+        self.assertSearches("FlatApartmentTbl", "PRIMARY KEY", plan)
+        self.assertSearches("ApartmentTbl", "PRIMARY KEY", plan)
+
+    def test_tenant_name_searches(self):
+        for field, index in (("TenantForename", "TenantForenameIdx"), ("TenantSurname", "TenantSurnameIdx")):
+            with self.subTest(field=field):
+                plan = self.plan_of(SQL.tenants.get_tenants, 'TenantID', field, 'Bo')
+                self.assertSearches("TenantTbl", index, plan)
+
+    def test_apartments(self):
+        for sort_field, index in (("ApartmentID", "ApartmentIDOrderIdx"), ("NumFlats", "ApartmentNumFlatsIdx"),
+                                  ("Upkeep", "ApartmentUpkeepIdx")):
+            with self.subTest(sort_field=sort_field):
+                plan = self.plan_of(SQL.apartments.get_apartments, sort_field, sort_field, '')
+                self.assertIndexed(plan)
+                self.assertIn(f"SCAN ApartmentTbl USING INDEX {index}", plan)
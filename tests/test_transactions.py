@@ -0,0 +1,61 @@
+"""
+These tests check that SQL.main.transaction commits its statements together, and undoes them all on an error.
+"""
+import sqlite3
+
+import SQL
+from SQL.main import process_sql, transaction
+from tests.database import DatabaseTestCase
+
+
+class TransactionTest(DatabaseTestCase):
+    def tearDown(self):
+        process_sql("DELETE FROM ApartmentTbl")
+
+    @staticmethod
+    def add_apartment(apartment_id):
+        SQL.apartments.add_apartment((apartment_id, "1 High Street", "AB1 2CD", ""))
+
+    @staticmethod
+    def apartment_ids():
+        return [record.ApartmentID for record in process_sql("SELECT ApartmentID FROM ApartmentTbl "
+                                                             "ORDER BY ApartmentID")]
+
+    def test_commit(self):
+        with transaction():
+            self.add_apartment("A0000")
+            self.add_apartment("A0001")
+        self.assertEqual(self.apartment_ids(), ["A0000", "A0001"])
+
+    def test_rollback(self):
+        with self.assertRaises(KeyError):
+            with transaction():
+                self.add_apartment("A0000")
+                raise KeyError
+        self.assertEqual(self.apartment_ids(), [])
+
+    def test_nested_rollback(self):
+        with transaction():
+            self.add_apartment("A0000")
+            with self.assertRaises(KeyError):
+                with transaction():
+                    self.add_apartment("A0001")
+                    raise KeyError
+            self.add_apartment("A0002")
+        self.assertEqual(self.apartment_ids(), ["A0000", "A0002"])
+
+    # After some errors SQLite has already rolled the transaction back, and the error must still be the one raised
+    def test_already_rolled_back(self):
+        for nested in (False, True):
+            with self.subTest(nested=nested):
+                with self.assertRaisesRegex(sqlite3.OperationalError, "disk is full"):
+                    with transaction() as conn:
+                        self.add_apartment("A0000")
+                        if nested:
+                            with transaction():
+                                conn.execute("ROLLBACK")
+                                raise sqlite3.OperationalError("disk is full")
+                        conn.execute("ROLLBACK")
+                        raise sqlite3.OperationalError("disk is full")
+                self.assertEqual(self.apartment_ids(), [])
+                self.assertFalse(conn.in_transaction)
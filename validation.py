@@ -7,6 +7,11 @@ import SQL
 import security
 
 
+# IDs are a letter followed by a number written with at least 4 digits, so T0001 to T9999, then T10000 onwards.
+# Only numbers below 1000 are padded with leading zeros, so each number has exactly one ID.
+ID_NUMBER = r'([0-9]{4}|[1-9][0-9]{4,})'
+
+
 # User validation
 def verify_login(username, password):
     pwdhash = SQL.users.find_hash(username)
@@ -14,16 +19,16 @@ def verify_login(username, password):
 
 
 def user_exists(username):
-    return bool(SQL.users.find_hash(username))
+    return SQL.users.user_exists(username)
 
 
 # Employees validation
 def employee_exists(employee_id):
-    return bool(SQL.employees.get_employee(employee_id))
+    return SQL.employees.employee_exists(employee_id)
 
 
 def check_employee_id(employee_id):
-    return bool(re.match(r'^E[0-9]{4}$', employee_id))
+    return bool(re.match(rf'^E{ID_NUMBER}$', employee_id))
 
 
 # Payments validation
@@ -33,29 +38,29 @@ def check_payment_id(payment_id):
 
 # Tenants validation
 def check_tenant_id(tenant_id):
-    return bool(re.match(r'^T[0-9]{4}$', tenant_id))
+    return bool(re.match(rf'^T{ID_NUMBER}$', tenant_id))
 
 
 def tenant_exists(tenant_id):
-    return bool(SQL.tenants.get_tenant(tenant_id))
+    return SQL.tenants.tenant_exists(tenant_id)
 
 
 def apartments_exist():
-    return bool(SQL.apartments.get_addresses())
+    return SQL.apartments.apartments_exist()
 
 
 # Apartments validation
 def check_apartment_id(apartment_id):
-    return bool(re.match(r'A[0-9]{4}$', apartment_id))
+    return bool(re.match(rf'A{ID_NUMBER}$', apartment_id))
 
 
 def apartment_exists(apartment_id):
-    return bool(SQL.apartments.get_apartment(apartment_id))
+    return SQL.apartments.apartment_exists(apartment_id)
 
 
 # Flats validation
 def apartment_flat_exists(apartment_id, flat_number):
-    return bool(SQL.flats.get_flat_id(apartment_id, flat_number))
+    return SQL.flats.flat_exists(apartment_id, flat_number)
 
 
 # Generic multi-table validation